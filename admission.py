@@ -0,0 +1,105 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from metrics import LatencyWindow
+
+COMMAND_SLOTS = 48  # Commands in flight at once across the bot
+QUEUE_LIMIT = 256  # Commands waiting for a slot before even reads are turned away
+QUEUE_TIMEOUT = 2.0  # Seconds a command may wait; under Discord's 3s to answer an interaction
+
+# Lower runs first when slots free up
+READ, NORMAL, WRITE = 0, 1, 2
+# Share of QUEUE_LIMIT each priority may queue into, so writes are shed long before reads
+QUEUE_SHARE = {READ: 1.0, NORMAL: 0.5, WRITE: 0.25}
+
+
+class AdmissionController:
+    """Bounds the commands in flight, queueing the overflow by priority and shedding the rest.
+
+    ``acquire`` returns at once while fewer than ``slots`` commands hold
+    one. Beyond that a command waits in a heap ordered by priority, then
+    arrival, and ``release`` hands the freed slot straight to the head of
+    it, so a cheap read queued behind a burst of summons still runs next.
+    A priority may only queue while the queue is shorter than its
+    QUEUE_SHARE of the limit, and a waiter that gets no slot within the
+    timeout gives up; either way ``acquire`` returns False and the command
+    should be answered with a busy reply instead of late.
+    """
+    def __init__(self, slots=COMMAND_SLOTS, queue_limit=QUEUE_LIMIT, timeout=QUEUE_TIMEOUT):
+        self.slots = slots
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.running = 0
+        self.depth = 0  # Live waiters; timed-out ones stay in the heap until popped
+        self.peak = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.waits = LatencyWindow()
+        self._waiting = []  # Heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+    @property
+    def congested(self):
+        return self.running >= self.slots or self.depth > 0
+
+    async def acquire(self, priority=NORMAL):
+        """Wait for a slot; returns False if the command was shed instead"""
+        if not self.congested:
+            self.running += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.running)
+            return True
+        if self.depth >= self.queue_limit * QUEUE_SHARE[priority]:
+            self.shed += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._seq), future))
+        self.depth += 1
+        self.queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.depth -= 1
+            self.timed_out += 1
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Handed a slot just as the command was cancelled
+            else:
+                self.depth -= 1
+            raise
+        finally:
+            self.waits.record(time.monotonic() - start)
+        self.admitted += 1
+        return True
+
+    def release(self):
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                # The slot passes straight to the waiter, so running stays the same
+                self.depth -= 1
+                future.set_result(True)
+                return
+        self.running -= 1
+
+    def stats(self):
+        wait_p50, wait_p99 = self.waits.summary()
+        return {
+            'running': self.running,
+            'depth': self.depth,
+            'peak': self.peak,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'shed': self.shed,
+            'timed_out': self.timed_out,
+            'wait_p50': wait_p50,
+            'wait_p99': wait_p99,
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+CHANNEL_EDITS = 5  # Message sends and edits a channel can burst, matching Discord's per-channel limit
+CHANNEL_WINDOW = 5.0  # Seconds for a channel's budget to refill completely
+TURBO_THRESHOLD = 40  # Animations in flight at which new ones skip straight to their result
+IDLE_CHANNELS = 1024  # Tracked channels before idle (full) budgets are forgotten
+
+
+class Animator:
+    """Plays embed animations while keeping each channel under its rate limit.
+
+    Every channel has a token bucket of CHANNEL_EDITS refilled over
+    CHANNEL_WINDOW, shared by all animations in it. An intermediate frame
+    is only sent if its channel has a token to spare; otherwise it is
+    dropped and the next frame supersedes it, without waiting out its
+    delay. The first frame and the result always go out, borrowing against
+    the bucket if need be so later frames back off. While TURBO_THRESHOLD
+    or more animations are in flight, new ones send only their result.
+    """
+    def __init__(self, edits=CHANNEL_EDITS, window=CHANNEL_WINDOW, turbo_threshold=TURBO_THRESHOLD):
+        self.edits = edits
+        self.rate = edits / window
+        self.turbo_threshold = turbo_threshold
+        self.buckets = {}  # channel_id -> [tokens, updated]
+        self.active = 0
+        self.shown = 0
+        self.dropped = 0
+        self.turbo = 0
+
+    def _take(self, channel_id, force=False):
+        now = time.monotonic()
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            if len(self.buckets) >= IDLE_CHANNELS:
+                self._forget_idle(now)
+            bucket = self.buckets[channel_id] = [float(self.edits), now]
+        else:
+            bucket[0] = min(self.edits, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1 and not force:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _forget_idle(self, now):
+        for channel_id, (tokens, updated) in list(self.buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.edits:
+                del self.buckets[channel_id]
+
+    async def play(self, ctx, frames, result, delay=1.0):
+        """Send frames[0], step through the rest delay seconds apart, and end on result.
+
+        frames and result are embeds; frames must be separate objects
+        (Embed.copy()) since they are sent later. Returns the message.
+        """
+        channel_id = ctx.channel.id
+        if self.active >= self.turbo_threshold or not frames:
+            self.turbo += 1
+            self._take(channel_id, force=True)
+            return await ctx.send(embed=result)
+
+        self.active += 1
+        try:
+            self._take(channel_id, force=True)
+            msg = await ctx.send(embed=frames[0])
+            self.shown += 1
+            for frame in frames[1:]:
+                if not self._take(channel_id):
+                    self.dropped += 1
+                    continue
+                await asyncio.sleep(delay)
+                await msg.edit(embed=frame)
+                self.shown += 1
+            await asyncio.sleep(delay)
+        finally:
+            self.active -= 1
+        self._take(channel_id, force=True)
+        await msg.edit(embed=result)
+        return msg
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'shown': self.shown,
+            'dropped': self.dropped,
+            'turbo': self.turbo,
+            'channels': len(self.buckets),
+        }
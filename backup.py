@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+from database import DB_PATH, SHARD_COUNT, shard_path
+
+BACKUP_DIR = 'backups'
+BACKUP_INTERVAL = 6 * 3600  # Seconds between scheduled snapshots
+BACKUP_KEEP = 7  # Snapshots kept before the oldest is deleted
+BACKUP_PAGES = 256  # Pages copied per backup step
+BACKUP_PAUSE = 0.005  # Seconds slept between steps so the writer gets the disk
+
+
+def backup_file(source_path, target_path, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    """Copy a live database with sqlite's online backup API, returning (pages, bytes).
+
+    The source connection holds a read transaction for the whole copy. In WAL
+    mode that pins one snapshot, so commits made by the bot meanwhile neither
+    restart the backup nor leak into it. The copy is written beside the
+    target and renamed into place, so a snapshot on disk is never torn.
+    """
+    partial = target_path + '.partial'
+    
+    def pause_between_steps(status, remaining, total):
+        # backup()'s own sleep only applies to steps that come back BUSY or LOCKED
+        if remaining and pause:
+            time.sleep(pause)
+    
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True, isolation_level=None)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute('BEGIN')
+        page_size = source.execute('PRAGMA page_size').fetchone()[0]
+        page_count = source.execute('PRAGMA page_count').fetchone()[0]
+        source.backup(target, pages=pages, sleep=pause, progress=pause_between_steps)
+        source.execute('COMMIT')
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+    os.replace(partial, target_path)
+    return page_count, page_count * page_size
+
+
+def rotate(directory=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Delete all but the newest keep snapshots, returning the names removed"""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = sorted(name for name in os.listdir(directory) if not name.endswith('.partial'))
+    removed = snapshots[:-keep] if keep else snapshots
+    for name in removed:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return removed
+
+
+def snapshot(path=DB_PATH, count=SHARD_COUNT, directory=BACKUP_DIR, keep=BACKUP_KEEP,
+             pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    """Back up every shard into a new timestamped snapshot directory, then rotate.
+
+    Shards are copied one after another, so each file is consistent on its
+    own but the set is not a single point in time.
+    """
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    partial = os.path.join(directory, name + '.partial')
+    os.makedirs(partial, exist_ok=True)
+    start = time.perf_counter()
+    total_pages = total_bytes = 0
+    try:
+        for index in range(count):
+            source = shard_path(path, index)
+            copied_pages, copied_bytes = backup_file(source, os.path.join(partial, os.path.basename(source)), pages, pause)
+            total_pages += copied_pages
+            total_bytes += copied_bytes
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    final = os.path.join(directory, name)
+    os.replace(partial, final)
+    elapsed = time.perf_counter() - start
+    return {
+        'path': final,
+        'files': count,
+        'pages': total_pages,
+        'bytes': total_bytes,
+        'seconds': elapsed,
+        'mb_per_second': total_bytes / (1 << 20) / elapsed if elapsed else 0.0,
+        'finished': time.time(),
+        'rotated': rotate(directory, keep),
+    }
+
+
+class BackupScheduler:
+    """Takes a snapshot every BACKUP_INTERVAL seconds on a background thread.
+
+    The copy runs in small page batches with a pause between steps, so it
+    never holds the database long enough to stall commands. ``last`` holds
+    the report of the most recent successful snapshot.
+    """
+    def __init__(self, path=DB_PATH, count=SHARD_COUNT, directory=BACKUP_DIR,
+                 interval=BACKUP_INTERVAL, keep=BACKUP_KEEP):
+        self.path = path
+        self.count = count
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.last = None
+        self.failures = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._copy = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.run()
+                print(f"Backup {report['path']}: {report['bytes'] / (1 << 20):.1f} MB "
+                      f"in {report['seconds']:.1f}s ({report['mb_per_second']:.1f} MB/s)")
+            except Exception as e:
+                print(f"Backup failed: {e}")
+
+    def running(self):
+        return self._lock.locked()
+
+    async def run(self):
+        """Take a snapshot now, waiting for any snapshot already in progress"""
+        async with self._lock:
+            self._copy = asyncio.ensure_future(
+                asyncio.to_thread(snapshot, self.path, self.count, self.directory, self.keep))
+            try:
+                # Shielded: cancelling the caller cannot stop the copy thread anyway
+                self.last = await asyncio.shield(self._copy)
+            except Exception:
+                self.failures += 1
+                raise
+            return self.last
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # Let a snapshot that is mid-copy finish before the database closes underneath it
+        if self._copy is not None and not self._copy.done():
+            await asyncio.wait([self._copy])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Snapshot the live database')
+    parser.add_argument('--path', default=DB_PATH)
+    parser.add_argument('--shards', type=int, default=SHARD_COUNT)
+    parser.add_argument('--dir', default=BACKUP_DIR)
+    parser.add_argument('--keep', type=int, default=BACKUP_KEEP)
+    args = parser.parse_args()
+    report = snapshot(args.path, args.shards, args.dir, args.keep)
+    print(f"Wrote {report['path']}: {report['pages']} pages, {report['bytes'] / (1 << 20):.1f} MB "
+          f"in {report['seconds']:.2f}s ({report['mb_per_second']:.1f} MB/s)")
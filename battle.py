@@ -0,0 +1,192 @@
+ELEMENTS = ('Fire', 'Water', 'Earth', 'Air', 'Dark', 'Light')
+ELEMENT_INDEX = {element: index for index, element in enumerate(ELEMENTS)}
+_STRONG = 1.2
+_WEAK = 0.8
+_MATCHUPS = {
+    'Fire': {'Water': _WEAK, 'Air': _STRONG},
+    'Water': {'Fire': _STRONG, 'Earth': _WEAK},
+    'Earth': {'Water': _STRONG, 'Air': _WEAK},
+    'Air': {'Earth': _STRONG, 'Fire': _WEAK},
+    'Dark': {'Light': _STRONG, 'Dark': _WEAK},
+    'Light': {'Dark': _STRONG, 'Light': _WEAK},
+}
+# EFFECTIVENESS[attacker][defender], indexed by ELEMENT_INDEX
+EFFECTIVENESS = tuple(
+    tuple(_MATCHUPS[attacker].get(defender, 1.0) for defender in ELEMENTS)
+    for attacker in ELEMENTS
+)
+
+ATTACK, SPECIAL, DEFEND = 0, 1, 2
+ACTIONS = ('attack', 'special', 'defend')
+PLAYER, OPPONENT = 0, 1
+VICTORY, DEFEAT = 1, 2
+SPECIAL_COOLDOWN = 3  # Rounds before a special can be used again
+
+RARITIES = ('Common', 'Uncommon', 'Rare', 'Epic', 'Legendary', 'Divine')
+RARITY_MULTIPLIERS = {
+    'Common': 1.0, 'Uncommon': 1.2, 'Rare': 1.5,
+    'Epic': 2.0, 'Legendary': 3.0, 'Divine': 5.0
+}
+TRAINING_MULTIPLIERS = {
+    'Common': 1.0, 'Uncommon': 1.2, 'Rare': 1.5,
+    'Epic': 1.8, 'Legendary': 2.0, 'Divine': 2.5
+}
+SUMMON_STATS = ((15, 30), (80, 120), (15, 30))  # (power, health, magic) ranges before the rarity multiplier
+LEVEL_GAINS = ((1, 3), (5, 10), (1, 3))  # (power, health, magic) gained per level up
+
+AI_FINISH_RANGE = 1.2  # AI goes for the kill when player HP is within power * this
+AI_FINISH_CHANCE = 0.7
+AI_SPECIAL_CHANCE = 0.4
+
+
+class Beast:
+    """Battle stats of one beast; ``element`` is an ELEMENT_INDEX value"""
+    __slots__ = ('beast_id', 'name', 'element', 'level', 'power', 'health', 'magic', 'rarity')
+
+    def __init__(self, beast_id, name, element, level, power, health, magic, rarity):
+        self.beast_id = beast_id
+        self.name = name
+        self.element = ELEMENT_INDEX[element] if isinstance(element, str) else element
+        self.level = level
+        self.power = power
+        self.health = health
+        self.magic = magic
+        self.rarity = rarity
+
+    @classmethod
+    def from_row(cls, row):
+        """Build from a (beast_id, beast_name, element, level, power, health, magic, rarity) row"""
+        return cls(*row)
+
+    @property
+    def element_name(self):
+        return ELEMENTS[self.element]
+
+
+def wild_beast(beast, name, element, rng):
+    """An AI opponent at the same level as beast with jittered stats"""
+    return Beast(
+        None, name, element, beast.level,
+        beast.power + rng.randint(-5, 5),
+        beast.health + rng.randint(-20, 20),
+        beast.magic + rng.randint(-5, 5),
+        'Unknown'
+    )
+
+
+class BattleState:
+    """Mutable state of one battle; ``outcome`` is None until VICTORY or DEFEAT.
+
+    Only ``step`` advances it, touching nothing but the state and the rng it
+    is given, so battles can be simulated in bulk or replayed from a seed
+    without Discord. Views just render the state and the events.
+    """
+    __slots__ = ('player', 'opponent', 'player_hp', 'opponent_hp', 'player_defended',
+                 'player_cooldown', 'opponent_cooldown', 'turn', 'outcome')
+
+    def __init__(self, player, opponent):
+        self.player = player
+        self.opponent = opponent
+        self.player_hp = player.health
+        self.opponent_hp = opponent.health
+        self.player_defended = False
+        self.player_cooldown = 0
+        self.opponent_cooldown = 0
+        self.turn = 0
+        self.outcome = None
+
+
+def _attack_damage(attacker, defender, rng):
+    return int(attacker.power * EFFECTIVENESS[attacker.element][defender.element] * rng.uniform(0.8, 1.2))
+
+
+def _special_damage(attacker, rng):
+    return int(attacker.magic * rng.uniform(1.2, 1.5))
+
+
+def _ai_choice(attacker, target_hp, cooldown, rng):
+    if target_hp <= attacker.power * AI_FINISH_RANGE and rng.random() < AI_FINISH_CHANCE:
+        return ATTACK  # Likely attack if the target can be finished
+    if cooldown == 0 and rng.random() < AI_SPECIAL_CHANCE:
+        return SPECIAL
+    return DEFEND
+
+
+def ai_action(state, rng):
+    """The opponent AI's policy played from the player's side, for AI-vs-AI runs"""
+    return _ai_choice(state.player, state.opponent_hp, state.player_cooldown, rng)
+
+
+def step(state, action, rng):
+    """Play one round: the player's action, then the AI's unless the opponent fell.
+
+    rng needs ``random()`` and ``uniform()`` (a random.Random or the random
+    module). Returns the round's events as (side, action, damage, reduced)
+    tuples; damage is 0 for DEFEND and reduced means halved by a defend.
+    """
+    if state.outcome is not None:
+        raise ValueError('battle is over')
+    if action == SPECIAL and state.player_cooldown:
+        raise ValueError('special is on cooldown')
+    state.turn += 1
+    player = state.player
+    opponent = state.opponent
+    player_special = opponent_special = False
+
+    # Player
+    if action == DEFEND:
+        state.player_defended = True
+        events = [(PLAYER, DEFEND, 0, False)]
+    else:
+        state.player_defended = False
+        if action == ATTACK:
+            damage = _attack_damage(player, opponent, rng)
+        else:
+            damage = _special_damage(player, rng)
+            state.player_cooldown = SPECIAL_COOLDOWN
+            player_special = True
+        events = [(PLAYER, action, damage, False)]
+        state.opponent_hp -= damage
+        if state.opponent_hp <= 0:
+            state.opponent_hp = 0
+            state.outcome = VICTORY
+            return events
+
+    # Opponent AI
+    reply = _ai_choice(opponent, state.player_hp, state.opponent_cooldown, rng)
+    if reply == ATTACK:
+        damage = _attack_damage(opponent, player, rng)
+    elif reply == SPECIAL:
+        damage = _special_damage(opponent, rng)
+        state.opponent_cooldown = SPECIAL_COOLDOWN
+        opponent_special = True
+    else:
+        damage = 0
+    reduced = damage > 0 and state.player_defended
+    if reduced:
+        damage //= 2
+    events.append((OPPONENT, reply, damage, reduced))
+    state.player_hp -= damage
+    if state.player_hp <= 0:
+        state.player_hp = 0
+        state.outcome = DEFEAT
+
+    # A special used this round keeps its full cooldown for the next one
+    if state.player_cooldown and not player_special:
+        state.player_cooldown -= 1
+    if state.opponent_cooldown and not opponent_special:
+        state.opponent_cooldown -= 1
+    return events
+
+
+def play_ai(state, rng, max_turns=200, recorder=None):
+    """Play a battle out with ai_action in the player's seat; outcome stays None past max_turns.
+
+    recorder, if given, is handed each round's action and events (see replay.Recorder).
+    """
+    while state.outcome is None and state.turn < max_turns:
+        action = ai_action(state, rng)
+        events = step(state, action, rng)
+        if recorder is not None:
+            recorder.record(action, events)
+    return state.outcome
@@ -0,0 +1,123 @@
+import time
+from collections import OrderedDict
+
+PLAYER_CACHE_SIZE = 10000  # Players kept in memory; size against the active-user count
+PLAYER_CACHE_TTL = 300  # Seconds before a cached player is re-read from the database
+
+
+class PlayerCache:
+    """Bounded LRU cache of player rows keyed by user_id.
+
+    Entries expire after ``ttl`` seconds. Writers call ``invalidate`` after
+    committing; a read that started before the invalidation cannot put its
+    (now stale) row back, because ``put`` checks the epoch the read began at.
+    """
+    def __init__(self, max_size=PLAYER_CACHE_SIZE, ttl=PLAYER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # user_id -> (expires_at, player)
+        self.epoch = 0
+        self._invalidated = OrderedDict()  # user_id -> epoch of its last invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        entry = self.entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[user_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, user_id):
+        """Return a cached player without touching LRU order or counters"""
+        entry = self.entries.get(user_id)
+        return entry[1] if entry else None
+
+    def put(self, user_id, player, since_epoch):
+        """Cache a row read at since_epoch unless it was invalidated meanwhile"""
+        if self._invalidated.get(user_id, -1) > since_epoch:
+            return False
+        if self._invalidated and len(self._invalidated) >= self.max_size and since_epoch < next(iter(self._invalidated.values())):
+            return False  # Too old to prove it wasn't invalidated
+        self.entries[user_id] = (time.monotonic() + self.ttl, player)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, user_id):
+        self.epoch += 1
+        self._invalidated[user_id] = self.epoch
+        self._invalidated.move_to_end(user_id)
+        while len(self._invalidated) > self.max_size:
+            self._invalidated.popitem(last=False)
+        if self.entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+class EmbedCache:
+    """Rendered embeds for commands whose output only changes with a catalog.
+
+    ``get(key, version, build)`` returns the embed cached under key if it
+    was built for the same version, and otherwise calls ``build()`` and
+    keeps the result. Owners of a catalog bump the version they pass when
+    it changes; ``invalidate`` drops entries outright. The embeds are
+    shared between every caller, so they must not be modified after
+    building; anything per-user goes on a copy.
+    """
+    def __init__(self):
+        self.entries = {}  # key -> (version, embed)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, version, build):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        embed = build()
+        self.entries[key] = (version, embed)
+        return embed
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when key is None"""
+        if key is None:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+        elif self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import LatencyWindow
+from migrations import apply_migrations
+
+DB_PATH = 'mythical_beasts.db'
+READER_THREADS = 4  # Read-only connections serving SELECTs in parallel per database file
+SHARD_COUNT = 1  # Database files players, beasts and inventory are spread over
+SHARD_ID_BITS = 40  # New beast/inventory ids on shard k start at k << SHARD_ID_BITS
+SHARDED_TABLES = ('players', 'beasts', 'inventory', 'battle_replays', 'jackpot_payouts')
+ID_RANGE_TABLES = ('beasts', 'inventory', 'battle_replays')  # AUTOINCREMENT ids that must be unique across shards
+
+
+def shard_path(path, index):
+    """File for shard index; shard 0 is the main database file itself"""
+    if index == 0:
+        return path
+    base = path[:-3] if path.endswith('.db') else path
+    return f'{base}.shard{index}.db'
+
+
+def shard_for(user_id, count):
+    """Stable hash partition of a user_id (snowflake low bits are not uniform)"""
+    if count == 1:
+        return 0
+    digest = hashlib.blake2b(int(user_id).to_bytes(8, 'little', signed=True), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % count
+
+
+class Database:
+    """Async access to the sqlite database.
+
+    The database runs in WAL mode so readers never wait for the writer.
+    SELECTs are spread over a pool of read-only connections, one per reader
+    thread. Every write is a whole transaction queued to a single writer
+    thread, which drains the queue in order, so two commands can never
+    interleave half-finished writes. Rows come back as sqlite3.Row, which
+    supports both positional (row[0]) and named (row['eldergems']) access.
+    """
+    def __init__(self, path=DB_PATH, readers=READER_THREADS, latency=None):
+        self.path = path
+        self.latency = latency or LatencyWindow()
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='sqlite-reader')
+        self.writes = queue.Queue()
+        self._local = threading.local()
+        self._reader_conns = []
+        self._reader_lock = threading.Lock()
+        self._writer_conn = None
+        self.writer = threading.Thread(target=self._writer_loop, name='sqlite-writer', daemon=True)
+        self.writer.start()
+
+    def _open_writer(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')  # WAL is still crash-safe with NORMAL
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._reader_lock:
+                self._reader_conns.append(conn)
+        return conn
+
+    def _writer_loop(self):
+        self._writer_conn = self._open_writer()
+        while True:
+            job = self.writes.get()
+            if job is None:
+                break
+            fn, args, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(self._writer_conn, *args))
+            except BaseException as e:
+                future.set_exception(e)
+        self._writer_conn.close()
+
+    async def _timed(self, future):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+    def _write(self, fn, *args):
+        """Queue fn(conn, *args) for the writer thread"""
+        future = Future()
+        self.writes.put((fn, args, future))
+        return self._timed(future)
+
+    def _read(self, fn, *args):
+        return self._timed(self.readers.submit(fn, *args))
+
+    def _fetchone(self, sql, params):
+        return self._reader().execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params):
+        return self._reader().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _transaction(conn, fn, args):
+        cursor = conn.cursor()
+        try:
+            result = fn(cursor, *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    async def migrate(self):
+        """Apply pending schema migrations, returning the versions applied"""
+        return await self._write(apply_migrations)
+
+    async def fetchone(self, sql, params=()):
+        return await self._read(self._fetchone, sql, params)
+
+    async def fetchall(self, sql, params=()):
+        return await self._read(self._fetchall, sql, params)
+
+    async def fetchval(self, sql, params=()):
+        row = await self.fetchone(sql, params)
+        return row[0] if row is not None else None
+
+    async def transaction(self, fn, *args):
+        """Run fn(cursor, *args) on the writer thread and commit atomically"""
+        return await self._write(self._transaction, fn, args)
+
+    async def execute(self, sql, params=()):
+        """Run a single write statement and return the affected row count"""
+        return await self.transaction(lambda cursor: cursor.execute(sql, params).rowcount)
+
+    async def insert(self, sql, params=()):
+        """Run a single INSERT and return the new row id"""
+        return await self.transaction(lambda cursor: cursor.execute(sql, params).lastrowid)
+
+    def pending_writes(self):
+        return self.writes.qsize()
+
+    def close(self):
+        self.writes.put(None)
+        self.writer.join()
+        self.readers.shutdown(wait=True)
+        with self._reader_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+
+
+def reserve_id_range(conn, index):
+    """Start shard index's AUTOINCREMENT ids in its own range so ids stay globally unique"""
+    floor = index << SHARD_ID_BITS
+    for table in ID_RANGE_TABLES:
+        updated = conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (floor, table)).rowcount
+        if not updated:
+            conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, floor))
+    conn.commit()
+
+
+class ShardedDatabase:
+    """Players, beasts, inventory and replays hash-partitioned by user_id over several files.
+
+    ``shard(user_id)`` returns the Database holding that player's rows. Shard 0
+    is the main database and also holds the global tables (guilds, jackpot). Every
+    shard hands out beast and inventory ids from its own range, so an id is
+    unique across shards; lookups by id alone use ``find``, which asks every
+    shard.
+    """
+    def __init__(self, path=DB_PATH, count=SHARD_COUNT, readers=READER_THREADS):
+        self.latency = LatencyWindow()
+        self.shards = [Database(shard_path(path, index), readers, self.latency) for index in range(count)]
+        self.main = self.shards[0]
+
+    def shard(self, user_id):
+        return self.shards[shard_for(user_id, len(self.shards))]
+
+    async def migrate(self):
+        """Migrate every shard, returning the versions applied to the main database"""
+        applied = await self.main.migrate()
+        for index, shard in enumerate(self.shards):
+            if shard is not self.main:
+                await shard.migrate()
+            await shard._write(reserve_id_range, index)
+        return applied
+
+    async def find(self, sql, params=()):
+        """First matching row from any shard"""
+        for row in await asyncio.gather(*(shard.fetchone(sql, params) for shard in self.shards)):
+            if row is not None:
+                return row
+        return None
+
+    async def fetchall(self, sql, params=()):
+        """Matching rows from every shard, concatenated"""
+        results = await asyncio.gather(*(shard.fetchall(sql, params) for shard in self.shards))
+        return [row for rows in results for row in rows]
+
+    def pending_writes(self):
+        return sum(shard.pending_writes() for shard in self.shards)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+
+def rebalance(path, old_count, new_count, batch_size=10000):
+    """Move rows between shard files after changing SHARD_COUNT.
+
+    Run with the bot stopped. Going from 1 to N splits an existing single
+    mythical_beasts.db into N shards. Rows keep their ids.
+    """
+    conns = [sqlite3.connect(shard_path(path, index)) for index in range(max(old_count, new_count))]
+    for index, conn in enumerate(conns):
+        conn.execute('PRAGMA journal_mode = WAL')
+        apply_migrations(conn)
+        reserve_id_range(conn, index)
+    moved = 0
+    for source_index in range(old_count):
+        source = conns[source_index]
+        for table in SHARDED_TABLES:
+            columns = [row[1] for row in source.execute(f'PRAGMA table_info({table})')]
+            user_column = columns.index('user_id')
+            insert = f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+            key = columns[0]
+            last_key = None
+            while True:
+                if last_key is None:
+                    rows = source.execute(f'SELECT * FROM {table} ORDER BY {key} LIMIT ?', (batch_size,)).fetchall()
+                else:
+                    rows = source.execute(f'SELECT * FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?',
+                                          (last_key, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_key = rows[-1][0]
+                outgoing = {}
+                for row in rows:
+                    target = shard_for(row[user_column], new_count)
+                    if target != source_index:
+                        outgoing.setdefault(target, []).append(row)
+                # Copy and commit on the target first, so a crash leaves duplicates rather than losses
+                for target, target_rows in outgoing.items():
+                    conns[target].executemany(insert, target_rows)
+                    conns[target].commit()
+                    source.executemany(f'DELETE FROM {table} WHERE {key} = ?', [(row[0],) for row in target_rows])
+                    moved += len(target_rows)
+                source.commit()
+    for conn in conns:
+        conn.close()
+    return moved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Database maintenance')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    rebalance_parser = subcommands.add_parser('rebalance', help='Move rows after changing SHARD_COUNT')
+    rebalance_parser.add_argument('--path', default=DB_PATH)
+    rebalance_parser.add_argument('--from', dest='old_count', type=int, default=1)
+    rebalance_parser.add_argument('--to', dest='new_count', type=int, default=SHARD_COUNT)
+    args = parser.parse_args()
+    if args.command == 'rebalance':
+        count = rebalance(args.path, args.old_count, args.new_count)
+        print(f'Moved {count} rows from {args.old_count} to {args.new_count} shards')
@@ -0,0 +1,87 @@
+import math
+import random
+
+import battle
+from sampler import AliasTable
+
+COINFLIP_MIN_BET = 10
+COIN_SIDES = ('heads', 'tails')
+COINFLIP_PAYOUT = 1.9  # 95% return
+
+SLOT_MIN_BET = 20
+SLOT_SYMBOLS = ('💎', '🔥', '💧', '🌿', '✨', '🌑')
+SLOT_REELS = 3
+SLOT_TRIPLE = 5
+SLOT_JACKPOT = '💎'  # Three of these also win the progressive jackpot
+SLOT_PAIR = 2
+
+JACKPOT_RATE = 0.01  # Slice of every bet fed to the progressive jackpot, out of the house edge
+JACKPOT_SEED = 1000.0  # Pool after a win
+
+AUTOPLAY_MAX = 50  # Rounds one autoplay command may settle
+
+WHEEL_MIN_BET = 50
+# 18% each for common elements, 14% for rare
+WHEEL_ODDS = AliasTable(battle.ELEMENTS, (0.18, 0.18, 0.18, 0.18, 0.14, 0.14))
+WHEEL_PAYOUT = 5
+
+# Return to player each game is meant to have, checked by rtp.py. The
+# progressive jackpot comes on top: it pays back JACKPOT_RATE of every bet.
+TARGET_RTP = {
+    'coinflip': {side: 0.95 for side in COIN_SIDES},
+    'slot': {None: 210 / 216},
+    'wheel': {element: 0.9 if element in ('Fire', 'Water', 'Earth', 'Air') else 0.7 for element in battle.ELEMENTS},
+}
+
+
+def flip_coin(rng=random):
+    return rng.choice(COIN_SIDES)
+
+
+def coinflip_multiplier(choice, result):
+    return COINFLIP_PAYOUT if choice == result else 0
+
+
+def spin_slots(rng=random):
+    return tuple(rng.choice(SLOT_SYMBOLS) for _ in range(SLOT_REELS))
+
+
+def slot_multiplier(reels):
+    """Payout per eldergem bet: three of a kind, else any two matching, else nothing"""
+    if len(set(reels)) == 1:
+        return SLOT_TRIPLE
+    if len(set(reels)) < len(reels):
+        return SLOT_PAIR
+    return 0
+
+
+def hits_jackpot(reels):
+    return all(symbol == SLOT_JACKPOT for symbol in reels)
+
+
+def spin_wheel(rng=random):
+    return WHEEL_ODDS.pick(rng)
+
+
+def wheel_multiplier(choice, result):
+    return WHEEL_PAYOUT if choice == result else 0
+
+
+def autoplay(multipliers, bet, stop_loss=None, take_profit=None):
+    """Net result of each round until the losses or winnings so far reach a limit.
+
+    The round that reaches stop_loss or take_profit is the last one played.
+    """
+    if not all(math.isfinite(value) for value in (bet, stop_loss or 0, take_profit or 0)):
+        raise ValueError('bet and limits must be finite')
+    deltas = []
+    net = 0.0
+    for multiplier in multipliers:
+        delta = bet * multiplier - bet
+        deltas.append(delta)
+        net += delta
+        if stop_loss is not None and net <= -stop_loss:
+            break
+        if take_profit is not None and net >= take_profit:
+            break
+    return deltas
@@ -0,0 +1,152 @@
+import asyncio
+import math
+from datetime import datetime
+
+JACKPOT_FLUSH_INTERVAL = 5.0  # Seconds between folding contributions into the pool row
+
+
+class Jackpot:
+    """Progressive jackpot pool fed by a slice of every bet.
+
+    Contributions only add to an in-memory accumulator; a background task
+    folds it into the single pool row on the main database every
+    JACKPOT_FLUSH_INTERVAL with one ``amount = amount + ?`` update, so bets
+    never queue on that row. ``value`` is the pool as of the last flush
+    plus the accumulator, good for display without a query.
+
+    A win is settled in two steps. One transaction on the main database
+    folds in the accumulator, logs the whole pool to ``jackpot_wins`` and
+    resets the row to the seed, so two simultaneous winners can never share
+    one pool. The winner's shard is then credited together with a
+    ``jackpot_payouts`` row keyed by the win, which makes the credit
+    idempotent; wins left unpaid by a crash between the steps are paid by
+    ``start``, and ones whose credit failed are retried by the flush task.
+    Each win is therefore paid exactly once.
+    """
+    def __init__(self, db, cache, leaderboard=None, flush_interval=JACKPOT_FLUSH_INTERVAL):
+        self.db = db
+        self.cache = cache
+        self.leaderboard = leaderboard
+        self.flush_interval = flush_interval
+        self.pending = 0.0
+        self.committed = 0.0
+        self.wins = 0
+        self.flushes = 0
+        self.unpaid = False  # A win's credit failed and is waiting for a retry
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def value(self):
+        return self.committed + self.pending
+
+    async def start(self):
+        row = await self.db.main.fetchone('SELECT amount, wins FROM jackpot WHERE jackpot_id = 1')
+        self.committed, self.wins = row['amount'], row['wins']
+        await self.settle()
+        self._task = asyncio.create_task(self._run())
+    
+    async def settle(self):
+        """Pay every logged win that has not been credited yet"""
+        self.unpaid = False
+        for win in await self.db.main.fetchall('''
+            SELECT win_id, user_id, amount FROM jackpot_wins WHERE paid_at IS NULL ORDER BY win_id
+        '''):
+            await self._pay(win['win_id'], win['user_id'], win['amount'])
+
+    async def close(self):
+        async with self._lock:
+            if self._task:
+                self._task.cancel()
+                self._task = None
+        await self.flush()
+
+    def contribute(self, amount):
+        # One NaN would poison pending for good, failing every flush and claim after it
+        if not math.isfinite(amount) or amount <= 0:
+            return
+        self.pending += amount
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self.unpaid:
+                    await self.settle()
+            except Exception as e:
+                print(f'Jackpot flush failed: {e}')
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            amount, self.pending = self.pending, 0.0
+            try:
+                # Read back the total so contributions from other processes show up too
+                self.committed = await self.db.main.transaction(lambda cursor: cursor.execute(
+                    'UPDATE jackpot SET amount = amount + ? WHERE jackpot_id = 1 RETURNING amount', (amount,)
+                ).fetchone()[0])
+            except Exception:
+                self.pending += amount
+                raise
+            self.flushes += 1
+
+    @staticmethod
+    def _claim(cursor, user_id, pending, seed, won_at):
+        amount = cursor.execute('SELECT amount FROM jackpot WHERE jackpot_id = 1').fetchone()[0] + pending
+        cursor.execute('UPDATE jackpot SET amount = ?, wins = wins + 1 WHERE jackpot_id = 1', (seed,))
+        win_id = cursor.execute('''
+            INSERT INTO jackpot_wins (user_id, amount, won_at) VALUES (?, ?, ?)
+        ''', (user_id, amount, won_at)).lastrowid
+        return win_id, amount
+
+    async def claim(self, user_id, seed):
+        """Win the whole pool for user_id, resetting it to seed; returns the amount won.
+
+        Raises only if the win could not be logged, in which case the pool
+        is untouched; a logged win whose credit fails is paid on a retry.
+        """
+        async with self._lock:
+            pending, self.pending = self.pending, 0.0
+            try:
+                win_id, amount = await self.db.main.transaction(
+                    self._claim, user_id, pending, seed, datetime.now().isoformat()
+                )
+            except Exception:
+                self.pending += pending
+                raise
+            self.committed = seed
+            self.wins += 1
+        try:
+            await self._pay(win_id, user_id, amount)
+        except Exception as e:
+            print(f'Jackpot payout of win {win_id} failed, will retry: {e}')
+            self.unpaid = True
+        return amount
+
+    @staticmethod
+    def _credit(cursor, win_id, user_id, amount):
+        cursor.execute('''
+            INSERT OR IGNORE INTO jackpot_payouts (win_id, user_id, amount) VALUES (?, ?, ?)
+        ''', (win_id, user_id, amount))
+        if not cursor.rowcount:
+            return False  # Already credited before a crash
+        cursor.execute('UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?', (amount, user_id))
+        return True
+
+    async def _pay(self, win_id, user_id, amount):
+        if await self.db.shard(user_id).transaction(self._credit, win_id, user_id, amount):
+            self.cache.invalidate(user_id)
+            if self.leaderboard is not None:
+                self.leaderboard.adjust(user_id, amount)
+        await self.db.main.execute('UPDATE jackpot_wins SET paid_at = ? WHERE win_id = ?',
+                                   (datetime.now().isoformat(), win_id))
+
+    def stats(self):
+        return {
+            'value': self.value,
+            'pending': self.pending,
+            'wins': self.wins,
+            'flushes': self.flushes,
+        }
@@ -0,0 +1,171 @@
+from bisect import bisect_left, insort
+
+LEADERBOARD_LOAD = 512  # Target keys per bucket; buckets split at twice this
+MEMBER_BITS = 64  # Members (user, beast and guild ids) must fit in this many bits
+MEMBER_MASK = (1 << MEMBER_BITS) - 1
+
+
+class Leaderboard:
+    """Order-statistic index of scores for rank lookups and paged top-N reads.
+
+    Entries are packed into a single int key, ``(-score << 64) + member``, so
+    ascending key order is descending score with ties broken by member id,
+    and each entry costs one int in memory. Keys live in sorted buckets of
+    about LEADERBOARD_LOAD. A Fenwick tree over bucket sizes turns a bucket
+    position into a rank, and a rank into a bucket position, in O(log n).
+    """
+    def __init__(self, scale=1):
+        self.scale = scale  # Scores are stored as int(round(score * scale))
+        self.keys = {}  # member -> packed key
+        self._buckets = []
+        self._maxes = []
+        self._tree = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, member):
+        return member in self.keys
+
+    def _pack(self, member, score):
+        return (-round(score * self.scale) << MEMBER_BITS) + member
+
+    def _unpack(self, key):
+        return key & MEMBER_MASK, -(key >> MEMBER_BITS) / self.scale
+
+    # Fenwick tree over bucket lengths
+    def _rebuild_tree(self):
+        tree = [len(bucket) for bucket in self._buckets]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos, delta):
+        while pos < len(self._tree):
+            self._tree[pos] += delta
+            pos |= pos + 1
+
+    def _prefix(self, pos):
+        """Number of keys in buckets before pos"""
+        total = 0
+        while pos > 0:
+            total += self._tree[pos - 1]
+            pos &= pos - 1
+        return total
+
+    def _locate(self, index):
+        """Bucket position and offset of the index-th key (0-based)"""
+        pos = 0
+        step = 1 << len(self._tree).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= len(self._tree) and self._tree[nxt - 1] <= index:
+                index -= self._tree[nxt - 1]
+                pos = nxt
+            step >>= 1
+        return pos, index
+
+    def build(self, entries):
+        """Replace the contents with (member, score) pairs"""
+        self.keys = {member: self._pack(member, score) for member, score in entries}
+        ordered = sorted(self.keys.values())
+        self._buckets = [ordered[i:i + LEADERBOARD_LOAD] for i in range(0, len(ordered), LEADERBOARD_LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._rebuild_tree()
+
+    def _insert(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            pos -= 1
+        bucket = self._buckets[pos]
+        insort(bucket, key)
+        self._maxes[pos] = bucket[-1]
+        if len(bucket) > 2 * LEADERBOARD_LOAD:
+            self._buckets[pos:pos + 1] = [bucket[:LEADERBOARD_LOAD], bucket[LEADERBOARD_LOAD:]]
+            self._maxes[pos:pos + 1] = [self._buckets[pos][-1], self._buckets[pos + 1][-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def _delete(self, key):
+        pos = bisect_left(self._maxes, key)
+        bucket = self._buckets[pos]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[pos] = bucket[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self._buckets[pos]
+            del self._maxes[pos]
+            self._rebuild_tree()
+
+    def set(self, member, score):
+        key = self._pack(member, score)
+        old = self.keys.get(member)
+        if old == key:
+            return
+        if old is not None:
+            self._delete(old)
+        self.keys[member] = key
+        self._insert(key)
+
+    def adjust(self, member, delta):
+        """Add delta to a member's score; members not on the board are ignored"""
+        if member in self.keys:
+            self.set(member, self.score(member) + delta)
+
+    def remove(self, member):
+        key = self.keys.pop(member, None)
+        if key is not None:
+            self._delete(key)
+
+    def score(self, member):
+        key = self.keys.get(member)
+        return self._unpack(key)[1] if key is not None else None
+
+    def rank(self, member):
+        """1-based rank of member, or None if it is not on the board"""
+        key = self.keys.get(member)
+        if key is None:
+            return None
+        pos = bisect_left(self._maxes, key)
+        return self._prefix(pos) + bisect_left(self._buckets[pos], key) + 1
+
+    def page(self, offset=0, limit=10):
+        """(rank, member, score) for up to limit entries starting at offset"""
+        results = []
+        if offset >= len(self.keys):
+            return results
+        pos, index = self._locate(offset)
+        rank = offset + 1
+        while pos < len(self._buckets) and len(results) < limit:
+            for key in self._buckets[pos][index:index + limit - len(results)]:
+                member, score = self._unpack(key)
+                results.append((rank, member, score))
+                rank += 1
+            pos += 1
+            index = 0
+        return results
+
+
+class Leaderboards:
+    """The bot's ranked views: player eldergems, beast power and guild power"""
+    def __init__(self):
+        self.eldergems = Leaderboard(scale=100)  # Keep cents
+        self.beasts = Leaderboard()  # power + health + magic
+        self.guilds = Leaderboard()  # guild_power
+
+    async def rebuild(self, db):
+        players = await db.fetchall('SELECT user_id, eldergems FROM players')
+        beasts = await db.fetchall('SELECT beast_id, power + health + magic FROM beasts')
+        guilds = await db.main.fetchall('SELECT guild_id, guild_power FROM guilds')
+        self.eldergems.build((row[0], row[1] or 0) for row in players)
+        self.beasts.build((row[0], row[1] or 0) for row in beasts)
+        self.guilds.build((row[0], row[1] or 0) for row in guilds)
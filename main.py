@@ -1,20 +1,135 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 from discord.ui import Button, View
 import random
 import asyncio
+import math
 import sqlite3
+import sys
 from datetime import datetime, timedelta
 import time
+from collections import deque
+from typing import Optional
+
+import admission
+from admission import AdmissionController
+from animation import Animator
+import battle
+import games
+from jackpot import Jackpot
+from backup import BackupScheduler
+from cache import EmbedCache, PlayerCache
+from database import ShardedDatabase
+from leaderboard import Leaderboards
+import matchmaking
+from metrics import LatencyWindow
+from pages import KeysetPager
+import replay
+from sampler import AliasTable
+from sessions import BattleRegistry
+from wallet import ShardedWallet
 
 # Configuration
 OWNER_IDS = [123456789012345678]  # Replace with your user ID
 COOLDOWN_RATE = 1  # Commands per 10 seconds
 COOLDOWN_TIME = 10  # Seconds
+AUTOBATTLE_MAX = 20  # Battles per !autobattle; its cooldown keeps the 30s-per-battle pace
 ELEMENT_EMOJIS = {
     'Fire': '🔥', 'Water': '💧', 'Earth': '🌿',
     'Air': '💨', 'Dark': '🌑', 'Light': '✨'
 }
+ITEM_TYPES = ('Consumable', 'Material')
+# Which commands go first when the bot is under load; anything unlisted is admission.NORMAL
+COMMAND_PRIORITIES = {
+    **dict.fromkeys(('profile', 'help', 'inventory', 'leaderboard', 'beasts', 'beast', 'replay', 'market'),
+                    admission.READ),
+    **dict.fromkeys(('summon', 'battle', 'autobattle', 'train', 'createguild'), admission.WRITE),
+}
+
+class ServerBusy(commands.CommandError):
+    """Raised instead of running a command the admission controller shed"""
+
+def option_choices(values):
+    """Fixed slash-command choices, each passed to the command exactly as listed"""
+    return [app_commands.Choice(name=value, value=value) for value in values]
+
+class AutoplayOption(commands.Converter, app_commands.Transformer):
+    """An autoplay setting: a number option in slash commands, written with its marker after a prefix (x50, stop=500)"""
+    marker = ''
+    kind = int
+    minimum = 1
+    maximum = None
+    
+    @property
+    def type(self):
+        return discord.AppCommandOptionType.integer if self.kind is int else discord.AppCommandOptionType.number
+    
+    @property
+    def min_value(self):
+        return self.minimum
+    
+    @property
+    def max_value(self):
+        return self.maximum
+    
+    async def convert(self, ctx, argument):
+        if not argument.lower().startswith(self.marker):
+            raise commands.BadArgument(f"Expected {self.marker}<number>, got '{argument}'")
+        try:
+            value = self.kind(argument[len(self.marker):])
+        except ValueError:
+            raise commands.BadArgument(f"'{argument}' is not {self.marker}<number>")
+        if not math.isfinite(value):
+            raise commands.BadArgument(f"'{argument}' is not {self.marker}<number>")
+        if value < self.minimum or (self.maximum is not None and value > self.maximum):
+            raise commands.BadArgument(f"{self.marker}<number> must be between {self.minimum} and {self.maximum or 'any'}")
+        return value
+    
+    async def transform(self, interaction, value):
+        return value  # Discord already checked the type and range
+
+class AutoplayRounds(AutoplayOption):
+    marker = 'x'
+    maximum = games.AUTOPLAY_MAX
+
+class StopLoss(AutoplayOption):
+    marker = 'stop='
+    kind = float
+    minimum = 0.01
+
+class TakeProfit(AutoplayOption):
+    marker = 'take='
+    kind = float
+    minimum = 0.01
+
+async def beast_id_autocomplete(interaction, current):
+    """The player's own beasts whose name or id matches what they have typed so far"""
+    rows = await interaction.client.db.shard(interaction.user.id).fetchall('''
+        SELECT beast_id, beast_name, element, level FROM beasts
+        WHERE user_id = ? AND (beast_name LIKE ? OR CAST(beast_id AS TEXT) LIKE ?)
+        ORDER BY level DESC, beast_id DESC LIMIT 25
+    ''', (interaction.user.id, f'%{current}%', f'{current}%'))
+    return [
+        app_commands.Choice(name=f"#{row[0]} {ELEMENT_EMOJIS[row[2]]} {row[1]} (Lv{row[3]})", value=row[0])
+        for row in rows
+    ]
+
+async def queue_autocomplete(interaction, current):
+    choices = [
+        app_commands.Choice(name=choice.name, value=str(choice.value))
+        for choice in await beast_id_autocomplete(interaction, current)
+    ]
+    if interaction.client.get_cog('BeastCommands').matchmaking.ticket(interaction.user.id):
+        choices = [app_commands.Choice(name="Leave the queue", value='leave')] + choices[:24]
+    return choices
+
+async def market_item_autocomplete(interaction, current):
+    items = interaction.client.get_cog('MarketCommands').market_items
+    return [
+        app_commands.Choice(name=f"{name} - {data['price']}💎", value=name)
+        for name, data in items.items() if current.lower() in name.lower()
+    ][:25]
 
 class CooldownView(View):
     """View for handling cooldown buttons"""
@@ -34,76 +149,194 @@ class CooldownView(View):
         self.last_used = time.time()
         return True
 
+class PageView(View):
+    """Previous/next buttons over a KeysetPager; only the player who asked can turn pages"""
+    def __init__(self, ctx, pager, render):
+        super().__init__(timeout=120)
+        self.ctx = ctx
+        self.pager = pager
+        self.render = render
+        self.message = None
+        self.update_buttons()
+    
+    def update_buttons(self):
+        self.previous_page.disabled = self.pager.page == 0
+        self.next_page.disabled = not self.pager.has_next
+    
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.ctx.author.id:
+            await interaction.response.send_message("❌ Use the command yourself to browse your own!", ephemeral=True)
+            return False
+        return True
+    
+    async def show(self, interaction):
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(self.pager), view=self)
+    
+    async def on_timeout(self):
+        for child in self.children:
+            child.disabled = True
+        if self.message is not None:
+            await self.message.edit(view=self)
+    
+    @discord.ui.button(style=discord.ButtonStyle.secondary, label="◀ Prev")
+    async def previous_page(self, interaction, button):
+        await self.pager.prev()
+        await self.show(interaction)
+    
+    @discord.ui.button(style=discord.ButtonStyle.secondary, label="Next ▶")
+    async def next_page(self, interaction, button):
+        await self.pager.next()
+        await self.show(interaction)
+
+def describe_event(state, event):
+    side, action, damage, reduced = event
+    beast = state.player if side == battle.PLAYER else state.opponent
+    if action == battle.DEFEND:
+        return f"{beast.name} defends"
+    verb = "attacks" if action == battle.ATTACK else "uses special"
+    return f"{beast.name} {verb} for {damage} damage{' (reduced)' if reduced else ''}"
+
+class BattleView(CooldownView):
+    """Buttons and embed for one battle; the rules themselves live in battle.step"""
+    def __init__(self, cog, ctx, state, opponent_name, opponent_id=None):
+        super().__init__(3)
+        self.timeout = None  # Idle battles are swept by the bot's BattleRegistry instead
+        self.cog = cog
+        self.ctx = ctx
+        self.state = state
+        self.opponent_name = opponent_name
+        self.opponent_id = opponent_id
+        self.log = deque(maxlen=3)
+        self.session = None
+        self.message = None
+        seed = replay.new_seed()
+        self.rng = random.Random(seed)
+        self.recorder = replay.Recorder(seed, state.player, state.opponent)
+
+    @staticmethod
+    def add_health(embed, beast, hp):
+        hp_percent = max(0, int((hp / beast.health) * 100))
+        embed.add_field(
+            name=f"{ELEMENT_EMOJIS[beast.element_name]} {beast.name} (Lv{beast.level})",
+            value=f"HP: {hp}/{beast.health} [{hp_percent}%]\n" +
+                  f"{'▓' * (hp_percent // 10)}{'░' * (10 - hp_percent // 10)}",
+            inline=False
+        )
+
+    def render(self):
+        embed = discord.Embed(
+            title=f"⚔️ Battle: {self.ctx.author.name} vs {self.opponent_name}",
+            color=0xf1c40f
+        )
+        self.add_health(embed, self.state.player, self.state.player_hp)
+        self.add_health(embed, self.state.opponent, self.state.opponent_hp)
+        
+        # Add battle log
+        if self.log:
+            log_text = "\n".join(self.log)
+            embed.add_field(name="Battle Log", value=f"```{log_text}```", inline=False)
+        
+        # Special button cooldown
+        if self.state.outcome is None:
+            cooldown = self.state.player_cooldown
+            self.special.label = f"Special ({cooldown})" if cooldown else "Special"
+            self.special.disabled = cooldown > 0
+        return embed
+
+    def footprint(self):
+        """Approximate bytes held by this battle, for the registry's memory stats"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.state) + sys.getsizeof(self.log)
+        size += sum(sys.getsizeof(beast) + sys.getsizeof(beast.name) for beast in (self.state.player, self.state.opponent))
+        size += sum(sys.getsizeof(line) for line in self.log)
+        size += sum(sys.getsizeof(item) for item in self.children)
+        return size
+
+    async def expire(self):
+        """Called by the registry once the battle has sat idle too long"""
+        self.stop()
+        for item in self.children:
+            item.disabled = True
+        embed = self.render()
+        embed.add_field(name="⌛ Abandoned", value="The battle timed out with no winner.", inline=False)
+        replay_id = await self.cog.save_replay(self.ctx.author.id, self.opponent_id, replay.KIND_BATTLE,
+                                               self.state, self.recorder)
+        embed.set_footer(text=f"Replay #{replay_id}")
+        if self.message is not None:
+            await self.message.edit(embed=embed, view=self)
+
+    async def play(self, interaction, action):
+        # Acknowledge the click first; the pause and the writes below can outlast Discord's 3s deadline
+        await interaction.response.defer()
+        self.cog.bot.battles.touch(self.session)
+        events = battle.step(self.state, action, self.rng)
+        self.recorder.record(action, events)
+        for event in events:
+            self.log.append(describe_event(self.state, event))
+        if self.state.outcome != battle.VICTORY:
+            await asyncio.sleep(1)  # Dramatic pause for the opponent's move
+        
+        if self.state.outcome is None:
+            return await interaction.edit_original_response(embed=self.render(), view=self)
+        
+        # End battle and give rewards
+        self.stop()
+        self.cog.bot.battles.finish(self.session)
+        for item in self.children:
+            item.disabled = True
+        embed = self.render()
+        await self.cog.battle_rewards(self.ctx, self.state, embed)
+        replay_id = await self.cog.save_replay(self.ctx.author.id, self.opponent_id, replay.KIND_BATTLE,
+                                               self.state, self.recorder)
+        embed.set_footer(text=f"Replay #{replay_id}")
+        await interaction.edit_original_response(embed=embed, view=self)
+
+    @discord.ui.button(style=discord.ButtonStyle.danger, label="Attack", row=0)
+    async def attack(self, interaction, button):
+        await self.play(interaction, battle.ATTACK)
+
+    @discord.ui.button(style=discord.ButtonStyle.primary, label="Special", row=0)
+    async def special(self, interaction, button):
+        await self.play(interaction, battle.SPECIAL)
+
+    @discord.ui.button(style=discord.ButtonStyle.secondary, label="Defend", row=0)
+    async def defend(self, interaction, button):
+        await self.play(interaction, battle.DEFEND)
+
 class MythicalBeastArenaBot(commands.Bot):
     def __init__(self):
+        # Every command is also a slash command, so the bot never needs to read message content.
+        # Prefix commands still work in DMs and when the bot is mentioned, which Discord always delivers.
         intents = discord.Intents.default()
-        intents.message_content = True
         intents.reactions = True
         intents.members = True
-        super().__init__(command_prefix='!', intents=intents, owner_ids=set(OWNER_IDS))
-        
-        self.conn = sqlite3.connect('mythical_beasts.db')
-        self.setup_database()
+        super().__init__(command_prefix=commands.when_mentioned_or('!'), intents=intents,
+                         owner_ids=set(OWNER_IDS), help_command=None)
+        
+        self.db = ShardedDatabase()
+        self.players = PlayerCache()
+        self.leaderboards = Leaderboards()
+        self.wallet = ShardedWallet(self.db, self.players, self.leaderboards.eldergems)
+        self.jackpot = Jackpot(self.db, self.players, self.leaderboards.eldergems)
+        self.command_latency = LatencyWindow()
+        self.backups = BackupScheduler(count=len(self.db.shards))
+        self.battles = BattleRegistry()
+        self.animator = Animator()
+        self.embeds = EmbedCache()
+        self.admission = AdmissionController()
         self.spam_control = commands.CooldownMapping.from_cooldown(COOLDOWN_RATE, COOLDOWN_TIME, commands.BucketType.user)
+        # Hooks rather than invoke(), since slash commands never go through invoke()
+        self.before_invoke(self.admit)
+        self.after_invoke(self.release)
 
-    def setup_database(self):
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS players (
-                user_id INTEGER PRIMARY KEY,
-                eldergems REAL DEFAULT 1000.0,
-                mana_crystals INTEGER DEFAULT 50,
-                guild_id INTEGER DEFAULT NULL,
-                rank TEXT DEFAULT 'Novice',
-                last_daily_claim TIMESTAMP DEFAULT NULL
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS beasts (
-                beast_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                beast_name TEXT,
-                beast_type TEXT,
-                element TEXT,
-                rarity TEXT,
-                level INTEGER DEFAULT 1,
-                experience INTEGER DEFAULT 0,
-                power INTEGER,
-                health INTEGER,
-                magic INTEGER,
-                equipped_item TEXT DEFAULT NULL,
-                FOREIGN KEY (user_id) REFERENCES players(user_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory (
-                inventory_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                item_name TEXT,
-                item_type TEXT,
-                rarity TEXT,
-                quantity INTEGER DEFAULT 1,
-                FOREIGN KEY (user_id) REFERENCES players(user_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS guilds (
-                guild_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_name TEXT UNIQUE,
-                leader_id INTEGER,
-                members_count INTEGER DEFAULT 1,
-                guild_level INTEGER DEFAULT 1,
-                guild_power INTEGER DEFAULT 0,
-                FOREIGN KEY (leader_id) REFERENCES players(user_id)
-            )
-        ''')
-        self.conn.commit()
-    
     async def setup_hook(self):
+        for version, description in await self.db.migrate():
+            print(f'Applied database migration {version}: {description}')
+        await self.wallet.start()
+        await self.leaderboards.rebuild(self.db)
+        await self.jackpot.start()
+        self.backups.start()
+        self.battles.start()
         await self.add_cog(CoreCommands(self))
         await self.add_cog(BeastCommands(self))
         await self.add_cog(GamblingCommands(self))
@@ -111,13 +344,64 @@ class MythicalBeastArenaBot(commands.Bot):
         await self.add_cog(GuildCommands(self))
         await self.add_cog(AlchemyCommands(self))
         await self.add_cog(AdminCommands(self))
+        synced = await self.tree.sync()
+        print(f'Synced {len(synced)} slash commands')
         print(f'Logged in as {self.user}')
 
+    async def add_cog(self, cog, **kwargs):
+        await super().add_cog(cog, **kwargs)
+        self.embeds.invalidate()  # Cached help lists the commands of every loaded cog
+    
+    async def remove_cog(self, name, **kwargs):
+        cog = await super().remove_cog(name, **kwargs)
+        self.embeds.invalidate()
+        return cog
+    
+    async def admit(self, ctx):
+        """Hold one of the admission controller's slots while the command runs, or shed it"""
+        ctx.started = time.perf_counter()  # Timed here since slash commands never go through invoke()
+        if await self.is_owner(ctx.author):
+            return  # Owners must still get through to diagnose an overload
+        if self.admission.congested and self.spam_control.update_rate_limit(ctx.message):
+            # While commands queue, nobody gets more than COOLDOWN_RATE per COOLDOWN_TIME
+            raise ServerBusy()
+        if not await self.admission.acquire(COMMAND_PRIORITIES.get(ctx.command.qualified_name, admission.NORMAL)):
+            raise ServerBusy()
+        ctx.admitted = True
+    
+    async def release(self, ctx):
+        # Called after the command and again from on_command_error; only the first call counts
+        started = getattr(ctx, 'started', None)
+        if started is not None:
+            ctx.started = None
+            self.command_latency.record(time.perf_counter() - started)
+        self.release_slot(ctx)
+    
+    def release_slot(self, ctx):
+        """Give the command's admission slot back early, once nothing but cosmetic sends is left"""
+        if getattr(ctx, 'admitted', False):
+            ctx.admitted = False
+            self.admission.release()
+    
+    async def animate(self, ctx, frames, result, delay=1.0):
+        """Play an animation outside the admitted section; it is mostly sleeps and would idle a slot"""
+        self.release_slot(ctx)
+        return await self.animator.play(ctx, frames, result, delay)
+
+    async def close(self):
+        await super().close()
+        await self.battles.close_all()
+        await self.backups.close()
+        await self.jackpot.close()
+        await self.wallet.close()
+        self.db.close()
+
     async def on_command_error(self, ctx, error):
+        await self.release(ctx)  # A failed slash command never reaches the after-invoke hook
         if isinstance(error, commands.CommandNotFound):
             embed = discord.Embed(
                 title="❌ Unknown Command",
-                description=f"Use `!help` to see available commands",
+                description=f"Use `/help` to see available commands",
                 color=0xe74c3c
             )
             await ctx.send(embed=embed)
@@ -127,21 +411,36 @@ class MythicalBeastArenaBot(commands.Bot):
                 description=f"Correct usage: `{ctx.prefix}{ctx.command.name} {ctx.command.signature}`",
                 color=0xe74c3c
             )
-            await ctx.send(embed=embed)
+            await ctx.send(embed=embed, ephemeral=True)
+        elif isinstance(error, commands.UserInputError):
+            embed = discord.Embed(
+                title="❌ Invalid Argument",
+                description=f"{error}\nCorrect usage: `{ctx.prefix}{ctx.command.name} {ctx.command.signature}`",
+                color=0xe74c3c
+            )
+            await ctx.send(embed=embed, ephemeral=True)
         elif isinstance(error, commands.CommandOnCooldown):
             embed = discord.Embed(
                 title="⏳ Command Cooldown",
                 description=f"Try again in {error.retry_after:.1f} seconds",
                 color=0xf1c40f
             )
-            await ctx.send(embed=embed, delete_after=error.retry_after)
+            await ctx.send(embed=embed, delete_after=error.retry_after, ephemeral=True)
+        elif isinstance(error, ServerBusy):
+            ctx.command.reset_cooldown(ctx)  # It never ran
+            embed = discord.Embed(
+                title="🌪️ The Arena Is Packed",
+                description="Too many summoners at once! Try again in a few seconds.",
+                color=0xf1c40f
+            )
+            await ctx.send(embed=embed, ephemeral=True)
         elif isinstance(error, commands.CheckFailure):
             embed = discord.Embed(
                 title="⛔ Permission Denied",
                 description="You don't have permission to use this command",
                 color=0xe74c3c
             )
-            await ctx.send(embed=embed)
+            await ctx.send(embed=embed, ephemeral=True)
         else:
             embed = discord.Embed(
                 title="⚠️ Unexpected Error",
@@ -155,34 +454,21 @@ class AdminCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
     
-    @commands.command(hidden=True)
+    @commands.hybrid_command(hidden=True)
     @commands.is_owner()
+    @app_commands.default_permissions(administrator=True)
     async def give(self, ctx, item_id: int, quantity: int, user: discord.Member):
         """Give items to a player (Owner only)"""
-        cursor = self.bot.conn.cursor()
-        
-        cursor.execute('SELECT item_name FROM inventory WHERE inventory_id = ?', (item_id,))
-        item = cursor.fetchone()
+        # Inventory ids are unique across shards, but the item may live on any of them
+        item = await self.bot.db.find('SELECT item_name, item_type, rarity FROM inventory WHERE inventory_id = ?', (item_id,))
         if not item:
             await ctx.send("❌ Invalid item ID!")
             return
         
         try:
-            cursor.execute('''
-                UPDATE inventory
-                SET quantity = quantity + ?
-                WHERE inventory_id = ? AND user_id = ?
-            ''', (quantity, item_id, user.id))
-            
-            if cursor.rowcount == 0:
-                cursor.execute('''
-                    INSERT INTO inventory (user_id, item_name, item_type, rarity, quantity)
-                    SELECT ?, item_name, item_type, rarity, ?
-                    FROM inventory
-                    WHERE inventory_id = ?
-                ''', (user.id, quantity, item_id))
-            
-            self.bot.conn.commit()
+            await self.bot.db.shard(user.id).transaction(
+                CoreCommands.add_item, user.id, item['item_name'], item['item_type'], item['rarity'], quantity
+            )
             
             embed = discord.Embed(
                 title="✨ Admin Action",
@@ -198,6 +484,158 @@ class AdminCommands(commands.Cog):
             )
             await ctx.send(embed=embed)
 
+    @commands.hybrid_command(hidden=True)
+    @commands.is_owner()
+    @app_commands.default_permissions(administrator=True)
+    async def dbstats(self, ctx):
+        """Show database and command latency (Owner only)"""
+        db_p50, db_p99 = self.bot.db.latency.summary()
+        cmd_p50, cmd_p99 = self.bot.command_latency.summary()
+        embed = discord.Embed(title="📊 Latency", color=0x3498db)
+        embed.add_field(
+            name="Database",
+            value=f"p50 {db_p50:.1f}ms | p99 {db_p99:.1f}ms\n{self.bot.db.latency.count} queries, "
+                  f"{self.bot.db.pending_writes()} writes queued",
+            inline=False
+        )
+        embed.add_field(
+            name="Commands",
+            value=f"p50 {cmd_p50:.1f}ms | p99 {cmd_p99:.1f}ms\n{self.bot.command_latency.count} commands",
+            inline=False
+        )
+        cache = self.bot.players.stats()
+        embed.add_field(
+            name="Player Cache",
+            value=f"{cache['size']} players | {cache['hit_rate']:.1%} hit rate\n"
+                  f"{cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions, "
+                  f"{cache['expirations']} expired, {cache['invalidations']} invalidated",
+            inline=False
+        )
+        queue = self.bot.get_cog('BeastCommands').matchmaking.stats()
+        embed.add_field(
+            name="Matchmaking",
+            value=f"{queue['depth']} queued | wait p50 {queue['wait_p50']:.1f}s, p99 {queue['wait_p99']:.1f}s\n"
+                  f"{queue['matched']} matches, {queue['timeouts']} timed out",
+            inline=False
+        )
+        battles = self.bot.battles.stats()
+        embed.add_field(
+            name="Battles",
+            value=f"{battles['live']} live ({battles['users']} players, peak {battles['peak']}) | "
+                  f"~{battles['memory'] / 1024:.0f} KB\n"
+                  f"{battles['finished']} finished, {battles['expired']} abandoned, {battles['refused']} refused",
+            inline=False
+        )
+        jackpot = self.bot.jackpot.stats()
+        embed.add_field(
+            name="Jackpot",
+            value=f"{jackpot['value']:,.2f}💎 ({jackpot['pending']:,.2f} unflushed) | "
+                  f"{jackpot['wins']} wins, {jackpot['flushes']} flushes",
+            inline=False
+        )
+        animations = self.bot.animator.stats()
+        embed.add_field(
+            name="Animations",
+            value=f"{animations['active']} playing | {animations['shown']} frames shown, "
+                  f"{animations['dropped']} dropped | {animations['turbo']} turbo",
+            inline=False
+        )
+        gate = self.bot.admission.stats()
+        embed.add_field(
+            name="Admission",
+            value=f"{gate['running']}/{self.bot.admission.slots} running (peak {gate['peak']}), {gate['depth']} queued | "
+                  f"wait p50 {gate['wait_p50']:.1f}ms, p99 {gate['wait_p99']:.1f}ms\n"
+                  f"{gate['admitted']} admitted, {gate['queued']} queued, {gate['shed']} shed "
+                  f"({gate['timed_out']} timed out)",
+            inline=False
+        )
+        embeds = self.bot.embeds.stats()
+        embed.add_field(
+            name="Embed Cache",
+            value=f"{embeds['size']} cached | {embeds['hit_rate']:.1%} hit rate\n"
+                  f"{embeds['hits']} hits, {embeds['misses']} builds, {embeds['invalidations']} invalidated",
+            inline=False
+        )
+        backup = self.bot.backups.last
+        embed.add_field(
+            name="Last Backup",
+            value=f"{datetime.fromtimestamp(backup['finished']):%Y-%m-%d %H:%M} | "
+                  f"{backup['bytes'] / (1 << 20):.1f} MB at {backup['mb_per_second']:.1f} MB/s" if backup else "None yet",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
+    @commands.hybrid_command(hidden=True)
+    @commands.is_owner()
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.choices(rarity=option_choices(battle.RARITIES))
+    async def simulate(self, ctx, axis: str = 'element', battles: int = 10000, rarity: str = 'Common', level: int = 1):
+        """Monte Carlo AI-vs-AI win rates along element, rarity or level (Owner only)"""
+        try:
+            import simulate
+        except ImportError:
+            return await ctx.send("❌ The battle simulator needs numpy installed")
+        axis = axis.lower()
+        rarity = rarity.capitalize()
+        if axis not in simulate.AXES or rarity not in battle.RARITIES:
+            return await ctx.send(f"❌ Usage: `/simulate [{'|'.join(simulate.AXES)}] [battles] [rarity] [level]`")
+        battles = max(1, min(battles, 100000))
+        
+        async with ctx.typing():
+            result = await asyncio.to_thread(simulate.matrix, axis, battles, rarity, level)
+        
+        embed = discord.Embed(
+            title=f"🎲 Battle Simulation: {axis.capitalize()}",
+            description=f"Win rate of row (challenger) against column\n```{simulate.format_matrix(result)}```",
+            color=0x9b59b6
+        )
+        embed.add_field(name="Mean Turns", value=f"```{simulate.format_matrix(result, 'turns')}```", inline=False)
+        total = len(result['labels']) ** 2 * battles
+        embed.set_footer(text=f"{total:,} battles in {result['seconds']:.1f}s ({result['battles_per_second']:,.0f}/s)")
+        await ctx.send(embed=embed)
+
+    @commands.hybrid_command(hidden=True)
+    @commands.is_owner()
+    @app_commands.default_permissions(administrator=True)
+    async def backup(self, ctx):
+        """Snapshot the database now without stopping the bot (Owner only)"""
+        await ctx.defer()
+        if self.bot.backups.running():
+            await ctx.send("⏳ A backup is already running, this one will start after it...")
+        try:
+            report = await self.bot.backups.run()
+        except Exception as e:
+            embed = discord.Embed(
+                title="⚠️ Backup Failed",
+                description=f"```{str(e)}```",
+                color=0xe74c3c
+            )
+            return await ctx.send(embed=embed)
+        embed = discord.Embed(
+            title="💾 Backup Complete",
+            description=f"`{report['path']}`",
+            color=0x2ecc71
+        )
+        embed.add_field(name="Size", value=f"{report['bytes'] / (1 << 20):.1f} MB ({report['pages']:,} pages)")
+        embed.add_field(name="Time", value=f"{report['seconds']:.1f}s")
+        embed.add_field(name="Throughput", value=f"{report['mb_per_second']:.1f} MB/s")
+        if report['rotated']:
+            embed.set_footer(text=f"Rotated out {len(report['rotated'])} old snapshot(s)")
+        await ctx.send(embed=embed)
+
+    @commands.hybrid_command(hidden=True)
+    @commands.is_owner()
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.autocomplete(item_name=market_item_autocomplete)
+    async def setprice(self, ctx, price: int, *, item_name: str):
+        """Change a market item's price (Owner only)"""
+        if price <= 0:
+            return await ctx.send("❌ Price must be positive!")
+        name = self.bot.get_cog('MarketCommands').set_price(item_name.strip(), price)
+        if name is None:
+            return await ctx.send(f"❌ Item '{item_name}' not found in the market!")
+        await ctx.send(f"✅ {name} now costs {price}💎 Eldergems.")
+
 class CoreCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -210,6 +648,7 @@ class CoreCommands(commands.Cog):
             'Legendary': {'chance': 0.009, 'color': 0xf1c40f},
             'Divine': {'chance': 0.001, 'color': 0xe74c3c}
         }
+        self.rarity_odds = AliasTable(self.rarities, [data['chance'] for data in self.rarities.values()])
         self.beast_types = {
             'Fire': ['Phoenix', 'Dragon', 'Hellhound', 'Salamander', 'Ifrit'],
             'Water': ['Kraken', 'Leviathan', 'Selkie', 'Kappa', 'Hydra'],
@@ -219,62 +658,75 @@ class CoreCommands(commands.Cog):
             'Light': ['Unicorn', 'Angel', 'Kirin', 'Valkyrie', 'Seraph']
         }
 
-    def get_player_data(self, user_id):
-        cursor = self.bot.conn.cursor()
-        cursor.execute('SELECT * FROM players WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
+    async def get_player_data(self, user_id):
+        player = await self.bot.wallet.fetch_player(user_id)
         
-        if result is None:
-            cursor.execute('INSERT INTO players (user_id) VALUES (?)', (user_id,))
-            self.create_starter_beast(user_id)
-            self.bot.conn.commit()
-            cursor.execute('SELECT * FROM players WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
-        
-        columns = [column[0] for column in cursor.description]
-        return dict(zip(columns, result))
+        if player is None:
+            starter = await self.bot.db.shard(user_id).transaction(self.create_player, user_id)
+            player = await self.bot.wallet.fetch_player(user_id)
+            if starter:
+                self.bot.leaderboards.eldergems.set(user_id, player['eldergems'])
+                self.bot.leaderboards.beasts.set(*starter)
+        
+        return player
+
+    async def debit(self, user_id, amount):
+        """Atomically spend eldergems, returning the new balance or None if short"""
+        balance = await self.bot.wallet.debit(user_id, amount)
+        if balance is None and await self.bot.wallet.fetch_player(user_id) is None:
+            # First command from this player: create them and try again
+            await self.get_player_data(user_id)
+            balance = await self.bot.wallet.debit(user_id, amount)
+        return balance
+
+    def create_player(self, cursor, user_id):
+        cursor.execute('INSERT OR IGNORE INTO players (user_id) VALUES (?)', (user_id,))
+        # Another command may have created the player first
+        if cursor.rowcount:
+            return self.create_starter_beast(cursor, user_id)
+        return None
 
-    def create_starter_beast(self, user_id):
+    @staticmethod
+    def add_item(cursor, user_id, item_name, item_type, rarity, quantity=1):
+        """Add items to a player's inventory, stacking onto an existing row"""
+        cursor.execute('''
+            INSERT INTO inventory (user_id, item_name, item_type, rarity, quantity)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, item_name, rarity) DO UPDATE SET quantity = quantity + excluded.quantity
+        ''', (user_id, item_name, item_type, rarity, quantity))
+
+    def create_starter_beast(self, cursor, user_id):
         element = random.choice(self.elements)
         beast_type = random.choice(self.beast_types[element])
         power = random.randint(10, 20)
         health = random.randint(50, 100)
         magic = random.randint(10, 20)
         
-        cursor = self.bot.conn.cursor()
         cursor.execute('''
             INSERT INTO beasts 
             (user_id, beast_name, beast_type, element, rarity, power, health, magic)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (user_id, beast_type, beast_type, element, 'Common', power, health, magic))
-        self.bot.conn.commit()
+        return cursor.lastrowid, power + health + magic
 
     def get_random_rarity(self):
-        roll = random.random()
-        cumulative = 0
-        for rarity, data in self.rarities.items():
-            cumulative += data['chance']
-            if roll <= cumulative:
-                return rarity
-        return 'Common'  # Fallback
+        return self.rarity_odds.pick()
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(2, 10, commands.BucketType.user)
     async def profile(self, ctx):
-        player = self.get_player_data(ctx.author.id)
-        cursor = self.bot.conn.cursor()
+        """Show your eldergems, mana crystals, rank, beasts and guild"""
+        player = await self.get_player_data(ctx.author.id)
         
-        cursor.execute('SELECT COUNT(*) FROM beasts WHERE user_id = ?', (ctx.author.id,))
-        beast_count = cursor.fetchone()[0]
+        beast_count = await self.bot.db.shard(ctx.author.id).fetchval('SELECT COUNT(*) FROM beasts WHERE user_id = ?', (ctx.author.id,))
         
-        cursor.execute('''
+        strongest_beast = await self.bot.db.shard(ctx.author.id).fetchone('''
             SELECT beast_name, level, element, rarity 
             FROM beasts 
             WHERE user_id = ? 
             ORDER BY (power + health + magic) DESC 
             LIMIT 1
         ''', (ctx.author.id,))
-        strongest_beast = cursor.fetchone()
         strongest_beast_info = (
             f"{strongest_beast[0]} (Lvl {strongest_beast[1]}, {strongest_beast[2]}, {strongest_beast[3]})" 
             if strongest_beast else "None"
@@ -282,10 +734,9 @@ class CoreCommands(commands.Cog):
         
         guild_info = "None"
         if player['guild_id']:
-            cursor.execute('SELECT guild_name FROM guilds WHERE guild_id = ?', (player['guild_id'],))
-            guild_result = cursor.fetchone()
-            if guild_result:
-                guild_info = guild_result[0]
+            guild_name = await self.bot.db.main.fetchval('SELECT guild_name FROM guilds WHERE guild_id = ?', (player['guild_id'],))
+            if guild_name:
+                guild_info = guild_name
         
         embed = discord.Embed(
             title=f"🧙 {ctx.author.name}'s Profile",
@@ -300,10 +751,11 @@ class CoreCommands(commands.Cog):
         embed.add_field(name="🏰 Guild", value=guild_info, inline=True)
         await ctx.send(embed=embed)
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 86400, commands.BucketType.user)
     async def daily(self, ctx):
-        player = self.get_player_data(ctx.author.id)
+        """Claim your daily eldergems and mana crystals"""
+        player = await self.get_player_data(ctx.author.id)
         if player['last_daily_claim'] and (datetime.now() - datetime.fromisoformat(player['last_daily_claim'])).days < 1:
             next_claim = datetime.fromisoformat(player['last_daily_claim']) + timedelta(days=1)
             delta = next_claim - datetime.now()
@@ -319,27 +771,30 @@ class CoreCommands(commands.Cog):
         # Claim rewards
         eldergems = random.randint(100, 300)
         mana = random.randint(10, 30)
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
-            UPDATE players SET
-                eldergems = eldergems + ?, 
-                mana_crystals = mana_crystals + ?,
-                last_daily_claim = ?
-            WHERE user_id = ?
-        ''', (eldergems, mana, datetime.now().isoformat(), ctx.author.id))
         
         # Bonus item
         bonus = ""
+        bonus_item = None
         if random.random() < 0.3:
             item_name = f"{random.choice(['Ancient', 'Mystic'])} {random.choice(['Scroll', 'Potion'])}"
             rarity = self.get_random_rarity()
-            cursor.execute('''
-                INSERT INTO inventory (user_id, item_name, item_type, rarity)
-                VALUES (?, ?, ?, ?)
-            ''', (ctx.author.id, item_name, 'Consumable', rarity))
+            bonus_item = (item_name, rarity)
             bonus = f"\n+ **{rarity} {item_name}**"
         
-        self.bot.conn.commit()
+        def claim(cursor):
+            cursor.execute('''
+                UPDATE players SET
+                    eldergems = eldergems + ?, 
+                    mana_crystals = mana_crystals + ?,
+                    last_daily_claim = ?
+                WHERE user_id = ?
+            ''', (eldergems, mana, datetime.now().isoformat(), ctx.author.id))
+            if bonus_item:
+                self.add_item(cursor, ctx.author.id, bonus_item[0], 'Consumable', bonus_item[1])
+        
+        await self.bot.db.shard(ctx.author.id).transaction(claim)
+        self.bot.players.invalidate(ctx.author.id)
+        self.bot.leaderboards.eldergems.adjust(ctx.author.id, eldergems)
         embed = discord.Embed(
             title="🎁 Daily Rewards Claimed!",
             description=f"Received:\n{eldergems}💎 Eldergems\n{mana}✨ Mana Crystals{bonus}",
@@ -347,13 +802,18 @@ class CoreCommands(commands.Cog):
         )
         await ctx.send(embed=embed)
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def help(self, ctx):
+        """List every command by category"""
         view = CooldownView(10)
+        await ctx.send(embed=self.bot.embeds.get('help', None, self.build_help), view=view)
+    
+    @staticmethod
+    def build_help():
         categories = {
-            "📋 Core": ["profile", "daily", "inventory"],
-            "🐲 Beasts": ["beasts", "summon", "battle", "train"],
+            "📋 Core": ["profile", "daily", "inventory", "leaderboard"],
+            "🐲 Beasts": ["beasts", "summon", "battle", "autobattle", "queue", "replay", "train"],
             "🎲 Gambling": ["coinflip", "slot", "elementalwheel"],
             "💰 Market": ["market", "buy", "sell"],
             "🏰 Guilds": ["createguild", "joinguild", "guildinfo"],
@@ -364,114 +824,212 @@ class CoreCommands(commands.Cog):
         for category, commands_list in categories.items():
             embed.add_field(
                 name=category,
-                value="\n".join([f"`!{cmd}`" for cmd in commands_list]),
+                value="\n".join([f"`/{cmd}`" for cmd in commands_list]),
                 inline=True
             )
-        
-        await ctx.send(embed=embed, view=view)
+        return embed
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(2, 10, commands.BucketType.user)
-    async def inventory(self, ctx):
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
-            SELECT inventory_id, item_name, item_type, rarity, quantity
-            FROM inventory
-            WHERE user_id = ?
-            ORDER BY rarity, item_name
-        ''', (ctx.author.id,))
-        items = cursor.fetchall()
+    @app_commands.choices(sort=option_choices(('rarity', 'name')), rarity=option_choices(battle.RARITIES),
+                          item_type=option_choices(ITEM_TYPES))
+    async def inventory(self, ctx, sort: Optional[str] = None, rarity: Optional[str] = None,
+                        item_type: Optional[str] = None):
+        """Browse your items; sort by rarity or name, filter by rarity or type"""
+        # Stacks are unique per (rarity, item_name), so that pair orders the rows on its own
+        sorts = {'rarity': ('rarity', 'item_name'), 'name': ('item_name', 'inventory_id')}
+        # Prefix commands may give the words in any order, so each is sorted out by what it names
+        options = [option for option in (sort, rarity, item_type) if option]
+        sort, filters = 'rarity', {}
+        for option in options:
+            word = option.capitalize()
+            if option.lower() in sorts:
+                sort = option.lower()
+            elif word in self.rarities:
+                filters['rarity'] = word
+            elif word in ITEM_TYPES:
+                filters['item_type'] = word
+            else:
+                return await ctx.send(f"❌ Unknown option '{option}'. Sort by {' or '.join(sorts)}, "
+                                      f"filter by a rarity or {' / '.join(ITEM_TYPES)}.")
         
-        if not items:
+        pager = KeysetPager(
+            self.bot.db.shard(ctx.author.id), 'inventory_id, item_name, item_type, rarity, quantity', 'inventory',
+            ' AND '.join(['user_id = ?'] + [f'{column} = ?' for column in filters]),
+            [ctx.author.id, *filters.values()], sorts[sort], descending=False
+        )
+        if not await pager.first():
             embed = discord.Embed(
                 title="🎒 Inventory",
-                description="Your inventory is empty.",
+                description="No items match those filters." if filters else "Your inventory is empty.",
                 color=0x95a5a6
             )
             return await ctx.send(embed=embed)
         
-        embed = discord.Embed(title="🎒 Inventory", color=0x3498db)
-        for item in items:
-            embed.add_field(
-                name=f"ID {item[0]}: {item[1]} (x{item[4]})",
-                value=f"Type: {item[2]} | Rarity: {item[3]}",
-                inline=False
-            )
+        def render(pager):
+            embed = discord.Embed(title="🎒 Inventory", color=0x3498db)
+            for item in pager.rows:
+                embed.add_field(
+                    name=f"ID {item[0]}: {item[1]} (x{item[4]})",
+                    value=f"Type: {item[2]} | Rarity: {item[3]}",
+                    inline=False
+                )
+            embed.set_footer(text=" • ".join([f"Page {pager.page + 1}", f"By {sort}", *filters.values()]))
+            return embed
+        
+        view = PageView(ctx, pager, render)
+        view.message = await ctx.send(embed=render(pager), view=view)
+
+    @commands.hybrid_command(aliases=['lb', 'top'])
+    @commands.cooldown(2, 10, commands.BucketType.user)
+    @app_commands.choices(board=option_choices(('eldergems', 'beasts', 'guilds')))
+    async def leaderboard(self, ctx, board: str = 'eldergems', page: int = 1):
+        """Top players by eldergems, beasts by strength, or guilds by power"""
+        board = board.lower()
+        page = max(1, page)
+        offset = (page - 1) * 10
+        boards = self.bot.leaderboards
+        
+        if board in ('eldergems', 'gems', 'players'):
+            ranking = boards.eldergems
+            title = "💎 Richest Players"
+            lines = [f"**#{rank:,}** <@{user_id}> — {score:,.2f}💎" for rank, user_id, score in ranking.page(offset, 10)]
+            your_rank = ranking.rank(ctx.author.id)
+        elif board in ('beasts', 'power'):
+            ranking = boards.beasts
+            title = "🐉 Strongest Beasts"
+            entries = ranking.page(offset, 10)
+            names = {}
+            if entries:
+                ids = [beast_id for _, beast_id, _ in entries]
+                rows = await self.bot.db.fetchall(f'''
+                    SELECT beast_id, beast_name, element, level, user_id
+                    FROM beasts WHERE beast_id IN ({', '.join('?' * len(ids))})
+                ''', ids)
+                names = {row[0]: row for row in rows}
+            lines = []
+            for rank, beast_id, score in entries:
+                beast = names.get(beast_id)
+                if beast:
+                    lines.append(f"**#{rank:,}** {ELEMENT_EMOJIS[beast[2]]} {beast[1]} (Lv{beast[3]}) <@{beast[4]}> — {score:,.0f}")
+            strongest = await self.bot.db.shard(ctx.author.id).fetchval('''
+                SELECT beast_id FROM beasts WHERE user_id = ?
+                ORDER BY (power + health + magic) DESC LIMIT 1
+            ''', (ctx.author.id,))
+            your_rank = ranking.rank(strongest) if strongest else None
+        elif board in ('guilds', 'guild'):
+            ranking = boards.guilds
+            title = "🏰 Mightiest Guilds"
+            entries = ranking.page(offset, 10)
+            names = {}
+            if entries:
+                ids = [guild_id for _, guild_id, _ in entries]
+                rows = await self.bot.db.main.fetchall(f'''
+                    SELECT guild_id, guild_name FROM guilds WHERE guild_id IN ({', '.join('?' * len(ids))})
+                ''', ids)
+                names = {row[0]: row[1] for row in rows}
+            lines = [f"**#{rank:,}** {names.get(guild_id, 'Unknown')} — {score:,.0f}⚔️" for rank, guild_id, score in entries]
+            player = await self.get_player_data(ctx.author.id)
+            your_rank = ranking.rank(player['guild_id']) if player['guild_id'] else None
+        else:
+            return await ctx.send("❌ Choose a leaderboard: `eldergems`, `beasts` or `guilds`")
+        
+        embed = discord.Embed(
+            title=title,
+            description="\n".join(lines) if lines else "No entries on this page.",
+            color=0xf1c40f
+        )
+        if your_rank:
+            embed.add_field(name="Your Rank", value=f"#{your_rank:,} of {len(ranking):,}", inline=False)
+        pages = max(1, (len(ranking) + 9) // 10)
+        embed.set_footer(text=f"Page {page} of {pages:,}")
         await ctx.send(embed=embed)
 
 class BeastCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.core = self.bot.get_cog('CoreCommands')
+        self.matchmaking = matchmaking.MatchQueue(self.resolve_match, self.queue_timeout)
+
+    async def cog_load(self):
+        self.matchmaking.start()
+
+    async def cog_unload(self):
+        await self.matchmaking.close()
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(2, 10, commands.BucketType.user)
-    async def beasts(self, ctx):
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
-            SELECT beast_id, beast_name, element, rarity, level 
-            FROM beasts WHERE user_id = ?
-            ORDER BY level DESC
-        ''', (ctx.author.id,))
-        beasts = cursor.fetchall()
+    @app_commands.choices(sort=option_choices(('level', 'strength')), element=option_choices(battle.ELEMENTS),
+                          rarity=option_choices(battle.RARITIES))
+    async def beasts(self, ctx, sort: Optional[str] = None, element: Optional[str] = None,
+                     rarity: Optional[str] = None):
+        """Browse your beasts; sort by level or strength, filter by element or rarity"""
+        # The strength expression must match idx_beasts_user_strength exactly
+        sorts = {'level': ('level', 'beast_id'), 'strength': ('power + health + magic', 'beast_id')}
+        # Prefix commands may give the words in any order, so each is sorted out by what it names
+        options = [option for option in (sort, element, rarity) if option]
+        sort, filters = 'level', {}
+        for option in options:
+            word = option.capitalize()
+            if option.lower() in sorts:
+                sort = option.lower()
+            elif word in ELEMENT_EMOJIS:
+                filters['element'] = word
+            elif word in self.core.rarities:
+                filters['rarity'] = word
+            else:
+                return await ctx.send(f"❌ Unknown option '{option}'. Sort by {' or '.join(sorts)}, "
+                                      f"filter by an element or a rarity.")
         
-        if not beasts:
-            return await ctx.send("You have no beasts! Use `!summon` to get one.")
+        pager = KeysetPager(
+            self.bot.db.shard(ctx.author.id), 'beast_id, beast_name, element, rarity, level, power + health + magic',
+            'beasts', ' AND '.join(['user_id = ?'] + [f'{column} = ?' for column in filters]),
+            [ctx.author.id, *filters.values()], sorts[sort]
+        )
+        if not await pager.first():
+            if filters:
+                return await ctx.send("No beasts match those filters!")
+            return await ctx.send("You have no beasts! Use `/summon` to get one.")
+        
+        def render(pager):
+            embed = discord.Embed(title=f"{ctx.author.name}'s Beasts", color=0x3498db)
+            for beast in pager.rows:
+                embed.add_field(
+                    name=f"ID {beast[0]}: {beast[1]}",
+                    value=f"{ELEMENT_EMOJIS[beast[2]]} {beast[2]} | {beast[3]} | Lv{beast[4]} | 💪 {beast[5]}",
+                    inline=False
+                )
+            embed.set_footer(text=" • ".join([f"Page {pager.page + 1}", f"By {sort}", *filters.values()]))
+            return embed
         
-        embed = discord.Embed(title=f"{ctx.author.name}'s Beasts", color=0x3498db)
-        for beast in beasts:
-            embed.add_field(
-                name=f"ID {beast[0]}: {beast[1]}",
-                value=f"{ELEMENT_EMOJIS[beast[2]]} {beast[2]} | {beast[3]} | Lv{beast[4]}",
-                inline=False
-            )
-        await ctx.send(embed=embed)
+        view = PageView(ctx, pager, render)
+        view.message = await ctx.send(embed=render(pager), view=view)
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 30, commands.BucketType.user)
     async def summon(self, ctx):
-        player = self.core.get_player_data(ctx.author.id)
-        if player['eldergems'] < 300:
+        """Summon a random beast for 300 eldergems"""
+        await ctx.defer()  # The animation takes a few seconds to reach the result
+        if await self.core.debit(ctx.author.id, 300) is None:
             return await ctx.send("❌ You need 300💎 Eldergems to summon!")
         
-        # Deduct cost
-        cursor = self.bot.conn.cursor()
-        cursor.execute('UPDATE players SET eldergems = eldergems - 300 WHERE user_id = ?', (ctx.author.id,))
-        
-        # Summon animation
-        embed = discord.Embed(title="🔮 Summoning...", color=0x9b59b6)
-        msg = await ctx.send(embed=embed)
-        for step in [
-            "Drawing ritual circles...",
-            "Chanting ancient words...",
-            "Channeling elemental energy..."
-        ]:
-            embed.description = step
-            await msg.edit(embed=embed)
-            await asyncio.sleep(1)
-        
         # Create beast
         rarity = self.core.get_random_rarity()
-        element = random.choice(list(self.core.beast_types.keys()))
+        element = random.choice(self.core.elements)
         beast_type = random.choice(self.core.beast_types[element])
-        multiplier = {
-            'Common': 1.0, 'Uncommon': 1.2, 'Rare': 1.5,
-            'Epic': 2.0, 'Legendary': 3.0, 'Divine': 5.0
-        }[rarity]
+        multiplier = battle.RARITY_MULTIPLIERS[rarity]
         
         stats = {
-            'power': int(random.randint(15, 30) * multiplier),
-            'health': int(random.randint(80, 120) * multiplier),
-            'magic': int(random.randint(15, 30) * multiplier)
+            stat: int(random.randint(low, high) * multiplier)
+            for stat, (low, high) in zip(('power', 'health', 'magic'), battle.SUMMON_STATS)
         }
         
-        cursor.execute('''
+        beast_id = await self.bot.db.shard(ctx.author.id).insert('''
             INSERT INTO beasts 
             (user_id, beast_name, beast_type, element, rarity, power, health, magic)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (ctx.author.id, beast_type, beast_type, element, rarity, stats['power'], stats['health'], stats['magic']))
-        beast_id = cursor.lastrowid
-        self.bot.conn.commit()
+        self.bot.leaderboards.beasts.set(beast_id, stats['power'] + stats['health'] + stats['magic'])
         
         embed = discord.Embed(
             title=f"{ELEMENT_EMOJIS[element]} Summon Successful!",
@@ -482,23 +1040,28 @@ class BeastCommands(commands.Cog):
         embed.add_field(name="Power", value=stats['power'], inline=True)
         embed.add_field(name="Health", value=stats['health'], inline=True)
         embed.add_field(name="Magic", value=stats['magic'], inline=True)
-        await msg.edit(embed=embed)
+        
+        # Summon animation
+        frames = [
+            discord.Embed(title="🔮 Summoning...", description=step, color=0x9b59b6)
+            for step in ("Drawing ritual circles...", "Chanting ancient words...", "Channeling elemental energy...")
+        ]
+        await self.bot.animate(ctx, frames, embed)
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(2, 10, commands.BucketType.user)
+    @app_commands.autocomplete(beast_id=beast_id_autocomplete)
     async def beast(self, ctx, beast_id: int):
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
+        """Show one of your beasts' stats"""
+        beast = await self.bot.db.shard(ctx.author.id).fetchone('''
             SELECT * FROM beasts 
             WHERE beast_id = ? AND user_id = ?
         ''', (beast_id, ctx.author.id))
-        beast = cursor.fetchone()
         
         if not beast:
             return await ctx.send("❌ Beast not found!")
         
-        columns = [col[0] for col in cursor.description]
-        beast_data = dict(zip(columns, beast))
+        beast_data = dict(beast)
         embed = discord.Embed(
             title=f"{ELEMENT_EMOJIS[beast_data['element']]} {beast_data['beast_name']}",
             color=self.core.rarities[beast_data['rarity']]['color']
@@ -511,384 +1074,450 @@ class BeastCommands(commands.Cog):
         embed.add_field(name="Magic", value=beast_data['magic'], inline=True)
         await ctx.send(embed=embed)
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 30, commands.BucketType.user)
+    @app_commands.autocomplete(beast_id=beast_id_autocomplete)
+    @app_commands.describe(opponent="Another player to fight instead of a wild beast",
+                           opponent_beast_id="Their beast; their strongest if left out")
     async def battle(self, ctx, beast_id: int, opponent: discord.Member = None, opponent_beast_id: int = None):
+        """Fight a wild beast or another player's beast turn by turn"""
         # Get player beast
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
+        player_beast = await self.bot.db.shard(ctx.author.id).fetchone('''
             SELECT beast_id, beast_name, element, level, power, health, magic, rarity
             FROM beasts WHERE beast_id = ? AND user_id = ?
         ''', (beast_id, ctx.author.id))
-        player_beast = cursor.fetchone()
         
         if not player_beast:
-            return await ctx.send("❌ Beast not found! Check your beasts with `!beasts`")
+            return await ctx.send("❌ Beast not found! Check your beasts with `/beasts`")
+        
+        player_beast = battle.Beast.from_row(player_beast)
         
         # If no opponent specified, battle AI
         if not opponent:
             # Create AI opponent with similar stats
-            ai_level = player_beast[3]
-            ai_stats = {
-                'power': player_beast[4] + random.randint(-5, 5),
-                'health': player_beast[5] + random.randint(-20, 20),
-                'magic': player_beast[6] + random.randint(-5, 5)
-            }
             ai_element = random.choice(self.core.elements)
             ai_beast_type = random.choice(self.core.beast_types[ai_element])
-            opponent_beast = (None, ai_beast_type, ai_element, ai_level, 
-                             ai_stats['power'], ai_stats['health'], ai_stats['magic'], 'Unknown')
+            opponent_beast = battle.wild_beast(player_beast, ai_beast_type, ai_element, random)
             opponent_name = "Wild Beast"
         else:
             # Get opponent beast
             if not opponent_beast_id:
                 # Get opponent's strongest beast if not specified
-                cursor.execute('''
+                opponent_beast = await self.bot.db.shard(opponent.id).fetchone('''
                     SELECT beast_id, beast_name, element, level, power, health, magic, rarity
                     FROM beasts WHERE user_id = ? ORDER BY (power + health + magic) DESC LIMIT 1
                 ''', (opponent.id,))
             else:
-                cursor.execute('''
+                opponent_beast = await self.bot.db.shard(opponent.id).fetchone('''
                     SELECT beast_id, beast_name, element, level, power, health, magic, rarity
                     FROM beasts WHERE beast_id = ? AND user_id = ?
                 ''', (opponent_beast_id, opponent.id))
                 
-            opponent_beast = cursor.fetchone()
             if not opponent_beast:
                 return await ctx.send("❌ Opponent beast not found!")
+            opponent_beast = battle.Beast.from_row(opponent_beast)
             opponent_name = opponent.name
-            
-        # Battle logic
-        view = CooldownView(3)
-        attack_btn = Button(style=discord.ButtonStyle.danger, label="Attack", row=0)
-        special_btn = Button(style=discord.ButtonStyle.primary, label="Special", row=0)
-        defend_btn = Button(style=discord.ButtonStyle.secondary, label="Defend", row=0)
-        
-        # Battle state
-        player_hp = player_beast[5]
-        opponent_hp = opponent_beast[5]
-        player_defended = False
-        special_cooldown = 0
-        turn_count = 0
-        battle_log = []
-        
-        # Element effectiveness 
-        effectiveness = {
-            'Fire': {'Water': 0.8, 'Air': 1.2},
-            'Water': {'Fire': 1.2, 'Earth': 0.8},
-            'Earth': {'Water': 1.2, 'Air': 0.8},
-            'Air': {'Earth': 1.2, 'Fire': 0.8},
-            'Dark': {'Light': 1.2, 'Dark': 0.8},
-            'Light': {'Dark': 1.2, 'Light': 0.8}
-        }
         
-        # Update battle display
-        async def update_battle(interaction=None):
-            player_hp_percent = max(0, int((player_hp / player_beast[5]) * 100))
-            opponent_hp_percent = max(0, int((opponent_hp / opponent_beast[5]) * 100))
+        view = BattleView(self, ctx, battle.BattleState(player_beast, opponent_beast), opponent_name,
+                          opponent.id if opponent else None)
+        view.session = self.bot.battles.open(ctx.author.id, view)
+        if view.session is None:
+            if self.bot.battles.user_count(ctx.author.id) >= self.bot.battles.per_user:
+                return await ctx.send("❌ Finish your current battles first!")
+            return await ctx.send("⏳ The arena is full right now, try again in a moment!")
+        view.message = await ctx.send(embed=view.render(), view=view)
+    
+    @staticmethod
+    def apply_victory(cursor, beast_id, level, exp_gain):
+        # Add experience and check for level up
+        cursor.execute('''
+            UPDATE beasts 
+            SET experience = experience + ? 
+            WHERE beast_id = ?
+        ''', (exp_gain, beast_id))
+        
+        # Check for level up - every 100 exp
+        cursor.execute('''
+            SELECT experience FROM beasts WHERE beast_id = ?
+        ''', (beast_id,))
+        new_exp = cursor.fetchone()[0]
+        
+        level_up = False
+        new_level = level
+        stat_gain = 0
+        if new_exp >= new_level * 100:
+            new_level += 1
+            power_gain, health_gain, magic_gain = (random.randint(low, high) for low, high in battle.LEVEL_GAINS)
             
-            embed = discord.Embed(
-                title=f"⚔️ Battle: {ctx.author.name} vs {opponent_name}",
-                color=0xf1c40f
-            )
+            cursor.execute('''
+                UPDATE beasts 
+                SET level = ?, power = power + ?, health = health + ?, magic = magic + ? 
+                WHERE beast_id = ?
+            ''', (new_level, power_gain, health_gain, magic_gain, beast_id))
+            level_up = True
+            stat_gain = power_gain + health_gain + magic_gain
+        return level_up, new_level, stat_gain
+    
+    async def battle_rewards(self, ctx, state, embed):
+        """Pay out a finished battle and add the result to its final embed"""
+        player_beast = state.player
+        opponent_beast = state.opponent
+        if state.outcome == battle.VICTORY:
+            # Calculate rewards
+            exp_gain = 10 + opponent_beast.level * 2
+            eldergem_reward = 50 + opponent_beast.level * 5
+            
+            # Update database
+            level_up, new_level, stat_gain = await self.bot.db.shard(ctx.author.id).transaction(
+                self.apply_victory, player_beast.beast_id, player_beast.level, exp_gain)
+            self.bot.leaderboards.beasts.adjust(player_beast.beast_id, stat_gain)
+            
+            # Add eldergems to player
+            await self.bot.wallet.adjust(ctx.author.id, eldergem_reward)
+            
+            # Victory message
             embed.add_field(
-                name=f"{ELEMENT_EMOJIS[player_beast[2]]} {player_beast[1]} (Lv{player_beast[3]})",
-                value=f"HP: {player_hp}/{player_beast[5]} [{player_hp_percent}%]\n" +
-                      f"{'▓' * (player_hp_percent // 10)}{'░' * (10 - player_hp_percent // 10)}",
+                name="🏆 Victory!",
+                value=f"Rewards:\n+{exp_gain} EXP\n+{eldergem_reward}💎 Eldergems",
                 inline=False
             )
+            
+            if level_up:
+                embed.add_field(
+                    name="🔼 Level Up!",
+                    value=f"{player_beast.name} leveled up to {new_level}!",
+                    inline=False
+                )
+            
+        else:
+            # Defeat - small consolation prize
+            consolation = 10 + opponent_beast.level * 2
+            await self.bot.wallet.adjust(ctx.author.id, consolation)
+            
             embed.add_field(
-                name=f"{ELEMENT_EMOJIS[opponent_beast[2]]} {opponent_beast[1]} (Lv{opponent_beast[3]})",
-                value=f"HP: {opponent_hp}/{opponent_beast[5]} [{opponent_hp_percent}%]\n" +
-                      f"{'▓' * (opponent_hp_percent // 10)}{'░' * (10 - opponent_hp_percent // 10)}",
+                name="💀 Defeat!",
+                value=f"Consolation: +{consolation}💎 Eldergems",
                 inline=False
             )
-            
-            # Add battle log
-            if battle_log:
-                log_text = "\n".join(battle_log[-3:])
-                embed.add_field(name="Battle Log", value=f"```{log_text}```", inline=False)
-            
-            # Special button cooldown
-            if special_cooldown > 0:
-                special_btn.label = f"Special ({special_cooldown})"
-                special_btn.disabled = True
-            else:
-                special_btn.label = "Special"
-                special_btn.disabled = False
-                
-            # Update message
-            if interaction:
-                await interaction.response.edit_message(embed=embed, view=view)
+    
+    async def save_replay(self, user_id, opponent_id, kind, state, recorder):
+        """Append a finished battle to the replay log, returning its replay id"""
+        return await self.bot.db.shard(user_id).insert(self.REPLAY_INSERT, (
+            user_id, opponent_id, state.player.beast_id, kind, state.outcome, int(time.time()), recorder.pack()
+        ))
+    
+    REPLAY_INSERT = '''
+        INSERT INTO battle_replays (user_id, opponent_id, beast_id, kind, outcome, created_at, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    @staticmethod
+    def run_autobattles(cursor, user_id, beast_id, count, elements, beast_types):
+        """Fight count wild battles with the AI's policy and store the combined result"""
+        cursor.execute('''
+            SELECT beast_id, beast_name, element, level, power, health, magic, rarity, experience
+            FROM beasts WHERE beast_id = ? AND user_id = ?
+        ''', (beast_id, user_id))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        beast = battle.Beast.from_row(tuple(row)[:8])
+        experience = row[8]
+        result = {
+            'wins': 0, 'losses': 0, 'draws': 0, 'exp': 0, 'eldergems': 0, 'turns': 0,
+            'start_level': beast.level, 'stat_gain': 0
+        }
+        replays = []
+        now = int(time.time())
+        
+        for _ in range(count):
+            element = random.choice(elements)
+            opponent = battle.wild_beast(beast, random.choice(beast_types[element]), element, random)
+            state = battle.BattleState(beast, opponent)
+            seed = replay.new_seed()
+            recorder = replay.Recorder(seed, beast, opponent, auto=True)
+            outcome = battle.play_ai(state, random.Random(seed), recorder=recorder)
+            # Packed now, before a level-up changes the beast's stats
+            replays.append((user_id, None, beast_id, replay.KIND_AUTOBATTLE, outcome, now, recorder.pack()))
+            result['turns'] += state.turn
+            if outcome == battle.VICTORY:
+                # Same rewards and level-up rule as a won !battle
+                exp_gain = 10 + opponent.level * 2
+                result['wins'] += 1
+                result['exp'] += exp_gain
+                result['eldergems'] += 50 + opponent.level * 5
+                experience += exp_gain
+                if experience >= beast.level * 100:
+                    beast.level += 1
+                    power_gain, health_gain, magic_gain = (random.randint(low, high) for low, high in battle.LEVEL_GAINS)
+                    beast.power += power_gain
+                    beast.health += health_gain
+                    beast.magic += magic_gain
+                    result['stat_gain'] += power_gain + health_gain + magic_gain
+            elif outcome == battle.DEFEAT:
+                result['losses'] += 1
+                result['eldergems'] += 10 + opponent.level * 2
             else:
-                return embed
+                result['draws'] += 1
         
-        # AI turn logic
-        async def ai_turn():
-            nonlocal opponent_hp, player_hp, battle_log, special_cooldown
-            
-            await asyncio.sleep(1)  # Dramatic pause
-            
-            # AI decides action
-            if player_hp <= opponent_beast[4] * 1.2 and random.random() < 0.7:
-                # If player can be defeated, likely attack
-                multiplier = 1.0
-                if player_beast[2] in effectiveness.get(opponent_beast[2], {}):
-                    multiplier = effectiveness[opponent_beast[2]][player_beast[2]]
-                
-                damage = int(opponent_beast[4] * multiplier * random.uniform(0.8, 1.2))
-                if player_defended:
-                    damage = damage // 2
-                    battle_log.append(f"{opponent_beast[1]} attacks for {damage} damage (reduced)")
-                else:
-                    battle_log.append(f"{opponent_beast[1]} attacks for {damage} damage")
-                player_hp -= damage
-            elif special_cooldown == 0 and random.random() < 0.4:
-                # Use special occasionally
-                damage = int(opponent_beast[6] * random.uniform(1.2, 1.5))
-                if player_defended:
-                    damage = damage // 2
-                    battle_log.append(f"{opponent_beast[1]} uses special for {damage} damage (reduced)")
-                else:
-                    battle_log.append(f"{opponent_beast[1]} uses special for {damage} damage")
-                player_hp -= damage
-                special_cooldown = 3
-                player_hp -= damage
-                special_cooldown = 3
-            else:
-                # Defend sometimes
-                battle_log.append(f"{opponent_beast[1]} defends")
-            
-            # Check if player defeated
-            if player_hp <= 0:
-                player_hp = 0
-                return False
-            return True
-            
-        # Player action handlers
-        async def handle_attack(interaction):
-            nonlocal opponent_hp, battle_log, player_defended
-            
-            # Reset defense status
-            player_defended = False
-            
-            # Calculate damage with element effectiveness
-            multiplier = 1.0
-            if opponent_beast[2] in effectiveness.get(player_beast[2], {}):
-                multiplier = effectiveness[player_beast[2]][opponent_beast[2]]
-                
-            damage = int(player_beast[4] * multiplier * random.uniform(0.8, 1.2))
-            battle_log.append(f"{player_beast[1]} attacks for {damage} damage")
-            opponent_hp -= damage
-            
-            # Check if opponent defeated
-            if opponent_hp <= 0:
-                opponent_hp = 0
-                await battle_end(True)
-                return
-            
-            # AI turn
-            player_alive = await ai_turn()
-            if not player_alive:
-                await battle_end(False)
-                return
-                
-            await update_battle(interaction)
-            
-        async def handle_special(interaction):
-            nonlocal opponent_hp, battle_log, player_defended, special_cooldown
-            
-            # Reset defense status
-            player_defended = False
-            
-            # Special attack damage based on magic stat
-            damage = int(player_beast[6] * random.uniform(1.2, 1.5))
-            battle_log.append(f"{player_beast[1]} uses special for {damage} damage")
-            opponent_hp -= damage
-            special_cooldown = 3
-            
-            # Check if opponent defeated
-            if opponent_hp <= 0:
-                opponent_hp = 0
-                await battle_end(True)
-                return
-            
-            # AI turn
-            player_alive = await ai_turn()
-            if not player_alive:
-                await battle_end(False)
-                return
-                
-            await update_battle(interaction)
+        cursor.execute('''
+            UPDATE beasts
+            SET experience = ?, level = ?, power = ?, health = ?, magic = ?
+            WHERE beast_id = ?
+        ''', (experience, beast.level, beast.power, beast.health, beast.magic, beast_id))
+        cursor.execute('''
+            UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?
+        ''', (result['eldergems'], user_id))
+        result['replays'] = [cursor.execute(BeastCommands.REPLAY_INSERT, row).lastrowid for row in replays]
+        result['beast'] = beast
+        return result
+    
+    @commands.hybrid_command()
+    @commands.cooldown(1, AUTOBATTLE_MAX * 30, commands.BucketType.user)
+    @app_commands.autocomplete(beast_id=beast_id_autocomplete)
+    async def autobattle(self, ctx, beast_id: int, count: int = AUTOBATTLE_MAX):
+        """Let a beast fight a run of wild battles on its own"""
+        if not 1 <= count <= AUTOBATTLE_MAX:
+            ctx.command.reset_cooldown(ctx)
+            return await ctx.send(f"❌ You can auto-battle 1 to {AUTOBATTLE_MAX} times at once!")
+        
+        await ctx.defer()
+        result = await self.bot.db.shard(ctx.author.id).transaction(
+            self.run_autobattles, ctx.author.id, beast_id, count, self.core.elements, self.core.beast_types)
+        if result is None:
+            ctx.command.reset_cooldown(ctx)
+            return await ctx.send("❌ Beast not found! Check your beasts with `/beasts`")
+        self.bot.players.invalidate(ctx.author.id)
+        self.bot.leaderboards.eldergems.adjust(ctx.author.id, result['eldergems'])
+        self.bot.leaderboards.beasts.adjust(beast_id, result['stat_gain'])
         
-        async def handle_defend(interaction):
-            nonlocal player_defended, battle_log
-            
-            player_defended = True
-            battle_log.append(f"{player_beast[1]} defends")
-            
-            # AI turn
-            player_alive = await ai_turn()
-            if not player_alive:
-                await battle_end(False)
-                return
-                
-            await update_battle(interaction)
+        beast = result['beast']
+        embed = discord.Embed(
+            title=f"{ELEMENT_EMOJIS[beast.element_name]} Auto-Battle: {beast.name}",
+            description=f"Fought {count} wild beasts in {result['turns']} turns",
+            color=0xf1c40f
+        )
+        embed.add_field(name="🏆 Wins", value=result['wins'], inline=True)
+        embed.add_field(name="💀 Losses", value=result['losses'], inline=True)
+        if result['draws']:
+            embed.add_field(name="🤝 Draws", value=result['draws'], inline=True)
+        embed.add_field(
+            name="Rewards",
+            value=f"+{result['exp']} EXP\n+{result['eldergems']}💎 Eldergems",
+            inline=False
+        )
+        if beast.level > result['start_level']:
+            embed.add_field(
+                name="🔼 Level Up!",
+                value=f"{beast.name} leveled up to {beast.level}! (+{result['stat_gain']} stats)",
+                inline=False
+            )
+        first, last = result['replays'][0], result['replays'][-1]
+        embed.set_footer(text=f"Replays #{first}" + (f" to #{last}" if last != first else ""))
+        await ctx.send(embed=embed)
+    
+    @commands.hybrid_command()
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    @app_commands.autocomplete(beast_id=queue_autocomplete)
+    async def queue(self, ctx, beast_id: str = None):
+        """Join ranked matchmaking with a beast, check your ticket, or leave with `/queue leave`"""
+        queue = self.matchmaking
+        ticket = queue.ticket(ctx.author.id)
+        
+        if beast_id is None:
+            if not ticket:
+                return await ctx.send(f"❌ You're not queued. Use `/queue <beast_id>` to find a ranked match! ({len(queue)} waiting)")
+            waited = time.monotonic() - ticket.joined
+            window = ticket.window(time.monotonic())
+            embed = discord.Embed(
+                title=f"🔎 Searching with {ticket.beast.name}",
+                description=f"Rating {ticket.rating:.0f} ± {ticket.deviation:.0f}\n"
+                            f"Waiting {waited:.0f}s, accepting opponents within "
+                            f"{'any rating' if window == float('inf') else f'{window:.0f} points'}",
+                color=0x3498db
+            )
+            embed.set_footer(text=f"{len(queue)} players in queue")
+            return await ctx.send(embed=embed)
         
-        # End battle and give rewards
-        async def battle_end(victory):
-            for item in view.children:
-                item.disabled = True
-            
-            embed = await update_battle()
-            
-            if victory:
-                # Calculate rewards
-                exp_gain = 10 + opponent_beast[3] * 2
-                eldergem_reward = 50 + opponent_beast[3] * 5
-                
-                # Update database
-                cursor = self.bot.conn.cursor()
-                
-                # Add experience and check for level up
-                cursor.execute('''
-                    UPDATE beasts 
-                    SET experience = experience + ? 
-                    WHERE beast_id = ?
-                ''', (exp_gain, player_beast[0]))
-                
-                # Check for level up - every 100 exp
-                cursor.execute('''
-                    SELECT experience FROM beasts WHERE beast_id = ?
-                ''', (player_beast[0],))
-                new_exp = cursor.fetchone()[0]
-                
-                level_up = False
-                new_level = player_beast[3]
-                if new_exp >= new_level * 100:
-                    new_level += 1
-                    power_gain = random.randint(1, 3)
-                    health_gain = random.randint(5, 10)
-                    magic_gain = random.randint(1, 3)
-                    
-                    cursor.execute('''
-                        UPDATE beasts 
-                        SET level = ?, power = power + ?, health = health + ?, magic = magic + ? 
-                        WHERE beast_id = ?
-                    ''', (new_level, power_gain, health_gain, magic_gain, player_beast[0]))
-                    level_up = True
-                
-                # Add eldergems to player
-                cursor.execute('''
-                    UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?
-                ''', (eldergem_reward, ctx.author.id))
-                
-                self.bot.conn.commit()
-                
-                # Victory message
-                embed.add_field(
-                    name="🏆 Victory!",
-                    value=f"Rewards:\n+{exp_gain} EXP\n+{eldergem_reward}💎 Eldergems",
-                    inline=False
-                )
-                
-                if level_up:
-                    embed.add_field(
-                        name="🔼 Level Up!",
-                        value=f"{player_beast[1]} leveled up to {new_level}!",
-                        inline=False
-                    )
-                
+        if beast_id.lower() == 'leave':
+            if not queue.leave(ctx.author.id):
+                return await ctx.send("❌ You're not in the queue!")
+            return await ctx.send("👋 You left the matchmaking queue.")
+        
+        if not beast_id.isdigit():
+            return await ctx.send("❌ Usage: `/queue <beast_id>`, `/queue` or `/queue leave`")
+        if ticket:
+            return await ctx.send(f"❌ You're already queued with {ticket.beast.name}! Use `/queue leave` first.")
+        
+        beast = await self.bot.db.shard(ctx.author.id).fetchone('''
+            SELECT beast_id, beast_name, element, level, power, health, magic, rarity,
+                   rating, rating_deviation, rated_at
+            FROM beasts WHERE beast_id = ? AND user_id = ?
+        ''', (int(beast_id), ctx.author.id))
+        if not beast:
+            return await ctx.send("❌ Beast not found! Check your beasts with `/beasts`")
+        
+        deviation = beast['rating_deviation']
+        if beast['rated_at']:
+            idle = datetime.now() - datetime.fromisoformat(beast['rated_at'])
+            deviation = matchmaking.decayed_deviation(deviation, idle.total_seconds() / 86400)
+        ticket = queue.join(ctx.author.id, battle.Beast.from_row(tuple(beast)[:8]), beast['rating'], deviation, ctx)
+        if ticket is None:
+            # Another !queue from this player joined while the beast was being looked up
+            ticket = queue.ticket(ctx.author.id)
+            return await ctx.send(f"❌ You're already queued with {ticket.beast.name}! Use `/queue leave` first.")
+        if ticket.ticket_id not in queue.tickets:
+            return await ctx.send(f"⚔️ Opponent found for {ticket.beast.name}!")
+        await ctx.send(f"🔎 {ticket.beast.name} (rating {beast['rating']:.0f}) joined the queue. "
+                       f"{len(queue)} waiting; you'll be pinged when a match is found.")
+    
+    async def resolve_match(self, a, b):
+        """Fight a ranked match between two tickets and rate both beasts"""
+        # Two legs with the seats swapped, since the player's seat has the edge
+        score = 0.0
+        legs = []
+        for first, second in ((a, b), (b, a)):
+            state = battle.BattleState(first.beast, second.beast)
+            seed = replay.new_seed()
+            recorder = replay.Recorder(seed, first.beast, second.beast, auto=True)
+            outcome = battle.play_ai(state, random.Random(seed), recorder=recorder)
+            if outcome is None:
+                winner = None
+                score += 0.25
             else:
-                # Defeat - small consolation prize
-                consolation = 10 + opponent_beast[3] * 2
-                cursor = self.bot.conn.cursor()
-                cursor.execute('''
-                    UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?
-                ''', (consolation, ctx.author.id))
-                self.bot.conn.commit()
-                
-                embed.add_field(
-                    name="💀 Defeat!",
-                    value=f"Consolation: +{consolation}💎 Eldergems",
-                    inline=False
-                )
-            
-            await msg.edit(embed=embed, view=view)
+                winner = first if outcome == battle.VICTORY else second
+                score += 0.5 if winner is a else 0.0
+            replay_id = await self.save_replay(first.user_id, second.user_id, replay.KIND_RANKED, state, recorder)
+            legs.append((winner, state.turn, replay_id))
+        
+        ratings = {
+            a: matchmaking.glicko_update(a.rating, a.deviation, b.rating, b.deviation, score),
+            b: matchmaking.glicko_update(b.rating, b.deviation, a.rating, a.deviation, 1 - score),
+        }
+        rated_at = datetime.now().isoformat()
+        for ticket, (rating, deviation) in ratings.items():
+            await self.bot.db.shard(ticket.user_id).execute('''
+                UPDATE beasts SET rating = ?, rating_deviation = ?, rated_at = ? WHERE beast_id = ?
+            ''', (rating, deviation, rated_at, ticket.beast.beast_id))
+        
+        # Same purse as a !battle: victory reward for the winner, consolation otherwise
+        for ticket, opponent, points in ((a, b, score), (b, a, 1 - score)):
+            if points > 0.5:
+                reward = 50 + opponent.beast.level * 5
+            else:
+                reward = 10 + opponent.beast.level * 2
+            await self.bot.wallet.adjust(ticket.user_id, reward)
         
-        # Connect buttons to handlers
-        attack_btn.callback = handle_attack
-        special_btn.callback = handle_special
-        defend_btn.callback = handle_defend
+        embed = discord.Embed(
+            title="⚔️ Ranked Match",
+            description=f"<@{a.user_id}>'s {ELEMENT_EMOJIS[a.beast.element_name]} {a.beast.name} vs "
+                        f"<@{b.user_id}>'s {ELEMENT_EMOJIS[b.beast.element_name]} {b.beast.name}",
+            color=0xf1c40f
+        )
+        for number, (winner, turns, replay_id) in enumerate(legs, 1):
+            embed.add_field(
+                name=f"Leg {number}",
+                value=(f"{winner.beast.name} wins in {turns} turns" if winner else f"Draw after {turns} turns") +
+                      f"\n`/replay {replay_id}`",
+                inline=True
+            )
+        result = "Draw" if score == 0.5 else f"{(a if score > 0.5 else b).beast.name} wins the match!"
+        embed.add_field(
+            name=f"🏆 {result}",
+            value="\n".join(
+                f"{ticket.beast.name}: {ticket.rating:.0f} → {rating:.0f} ({rating - ticket.rating:+.0f})"
+                for ticket, (rating, _) in ratings.items()
+            ),
+            inline=False
+        )
+        channels = {}
+        for ticket in (a, b):
+            channels.setdefault(ticket.ctx.channel.id, ticket.ctx)
+        for ctx in channels.values():
+            await ctx.send(content=f"<@{a.user_id}> <@{b.user_id}>", embed=embed)
+    
+    async def queue_timeout(self, ticket):
+        await ticket.ctx.send(f"⌛ <@{ticket.user_id}> No opponent found for {ticket.beast.name}, you left the queue.")
+    
+    @commands.hybrid_command()
+    @commands.cooldown(2, 10, commands.BucketType.user)
+    async def replay(self, ctx, replay_id: int = None):
+        """Watch a recorded battle again, or list your latest ones"""
+        kinds = {replay.KIND_BATTLE: "Battle", replay.KIND_AUTOBATTLE: "Auto-Battle", replay.KIND_RANKED: "Ranked"}
+        outcomes = {battle.VICTORY: "🏆", battle.DEFEAT: "💀", None: "🤝"}
+        
+        if replay_id is None:
+            rows = await self.bot.db.shard(ctx.author.id).fetchall('''
+                SELECT replay_id, kind, outcome, created_at, LENGTH(data) FROM battle_replays
+                WHERE user_id = ? ORDER BY replay_id DESC LIMIT 10
+            ''', (ctx.author.id,))
+            if not rows:
+                return await ctx.send("❌ You have no recorded battles yet!")
+            embed = discord.Embed(title="📼 Your Latest Battles", color=0x3498db)
+            embed.description = "\n".join(
+                f"{outcomes[row[2]]} `#{row[0]}` {kinds[row[1]]} — <t:{row[3]}:R> ({row[4]} bytes)" for row in rows
+            )
+            embed.set_footer(text="Use /replay <id> to watch one")
+            return await ctx.send(embed=embed)
         
-        # Add buttons to view
-        view.add_item(attack_btn)
-        view.add_item(special_btn)
-        view.add_item(defend_btn)
+        row = await self.bot.db.find('''
+            SELECT user_id, opponent_id, kind, created_at, data FROM battle_replays WHERE replay_id = ?
+        ''', (replay_id,))
+        if not row:
+            return await ctx.send("❌ Replay not found!")
         
-        # Start battle
-        embed = await update_battle()
-        msg = await ctx.send(embed=embed, view=view)
+        state, rounds, diverged_at = replay.play(row['data'])
+        lines = [
+            f"{number}. " + " | ".join(describe_event(state, event) for event in events)
+            for number, events in enumerate(rounds, 1)
+        ]
+        while sum(len(line) + 1 for line in lines) > 3900:
+            lines.pop(0)
+        if len(lines) < len(rounds):
+            lines.insert(0, f"... {len(rounds) - len(lines)} earlier rounds")
+        
+        opponent = f"<@{row['opponent_id']}>" if row['opponent_id'] else "Wild Beast"
+        embed = discord.Embed(
+            title=f"📼 {kinds[row['kind']]} Replay #{replay_id}",
+            description=f"<@{row['user_id']}> vs {opponent}, <t:{row['created_at']}:f>\n```{chr(10).join(lines)}```",
+            color=0x3498db
+        )
+        BattleView.add_health(embed, state.player, state.player_hp)
+        BattleView.add_health(embed, state.opponent, state.opponent_hp)
+        result = {battle.VICTORY: f"🏆 {state.player.name} won", battle.DEFEAT: f"💀 {state.opponent.name} won"}
+        embed.add_field(name="Result", value=result.get(state.outcome, "🤝 No winner"), inline=False)
+        if diverged_at:
+            embed.set_footer(text=f"⚠️ The current rules play this differently from round {diverged_at} on")
+        else:
+            embed.set_footer(text=f"{len(row['data'])} bytes • matches the battle engine")
+        await ctx.send(embed=embed)
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 30, commands.BucketType.user)
+    @app_commands.autocomplete(beast_id=beast_id_autocomplete)
     async def train(self, ctx, beast_id: int):
+        """Spend eldergems to give a beast experience"""
+        await ctx.defer()  # The animation takes a few seconds to reach the result
         # Get beast data
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
+        beast = await self.bot.db.shard(ctx.author.id).fetchone('''
             SELECT beast_name, level, experience, element, rarity
             FROM beasts WHERE beast_id = ? AND user_id = ?
         ''', (beast_id, ctx.author.id))
-        beast = cursor.fetchone()
         
         if not beast:
             return await ctx.send("❌ Beast not found!")
         
-        # Check if player has enough eldergems
-        player = self.core.get_player_data(ctx.author.id)
+        # Deduct cost if player has enough eldergems
         training_cost = 20 * beast[1]  # Cost scales with beast level
         
-        if player['eldergems'] < training_cost:
+        if await self.core.debit(ctx.author.id, training_cost) is None:
             return await ctx.send(f"❌ You need {training_cost}💎 Eldergems to train your beast!")
         
-        # Deduct cost
-        cursor.execute('UPDATE players SET eldergems = eldergems - ? WHERE user_id = ?', 
-                      (training_cost, ctx.author.id))
-        
-        # Training animation
-        embed = discord.Embed(
-            title=f"🏆 Training {beast[0]}",
-            description="Starting training session...",
-            color=0x3498db
-        )
-        msg = await ctx.send(embed=embed)
-        
-        # Training steps
-        training_steps = [
-            f"{beast[0]} is warming up...",
-            f"{beast[0]} is practicing {beast[3]} techniques...",
-            f"{beast[0]} is building strength...",
-            f"Training complete!"
-        ]
-        
-        for step in training_steps:
-            embed.description = step
-            await msg.edit(embed=embed)
-            await asyncio.sleep(1)
-        
         # Calculate gains - based on rarity
-        exp_multiplier = {
-            'Common': 1.0, 'Uncommon': 1.2, 'Rare': 1.5,
-            'Epic': 1.8, 'Legendary': 2.0, 'Divine': 2.5
-        }[beast[4]]
+        exp_multiplier = battle.TRAINING_MULTIPLIERS[beast[4]]
         
         exp_gain = int(random.randint(10, 20) * exp_multiplier)
         
-        # Update beast
-        cursor.execute('''
-            UPDATE beasts SET experience = experience + ? WHERE beast_id = ?
-        ''', (exp_gain, beast_id))
-        
         # Check for level up - every 100 exp
         new_exp = beast[2] + exp_gain
         level_up = False
@@ -896,18 +1525,25 @@ class BeastCommands(commands.Cog):
         
         if new_exp >= new_level * 100:
             new_level += 1
-            power_gain = random.randint(1, 3)
-            health_gain = random.randint(5, 10)
-            magic_gain = random.randint(1, 3)
-            
-            cursor.execute('''
-                UPDATE beasts 
-                SET level = ?, power = power + ?, health = health + ?, magic = magic + ? 
-                WHERE beast_id = ?
-            ''', (new_level, power_gain, health_gain, magic_gain, beast_id))
+            power_gain, health_gain, magic_gain = (random.randint(low, high) for low, high in battle.LEVEL_GAINS)
             level_up = True
         
-        self.bot.conn.commit()
+        def apply_training(cursor):
+            # Update beast
+            cursor.execute('''
+                UPDATE beasts SET experience = experience + ? WHERE beast_id = ?
+            ''', (exp_gain, beast_id))
+            
+            if level_up:
+                cursor.execute('''
+                    UPDATE beasts 
+                    SET level = ?, power = power + ?, health = health + ?, magic = magic + ? 
+                    WHERE beast_id = ?
+                ''', (new_level, power_gain, health_gain, magic_gain, beast_id))
+        
+        await self.bot.db.shard(ctx.author.id).transaction(apply_training)
+        if level_up:
+            self.bot.leaderboards.beasts.adjust(beast_id, power_gain + health_gain + magic_gain)
         
         # Results
         embed = discord.Embed(
@@ -930,81 +1566,167 @@ class BeastCommands(commands.Cog):
                 inline=False
             )
         
-        await msg.edit(embed=embed)
+        # Training animation
+        frames = [
+            discord.Embed(title=f"🏆 Training {beast[0]}", description=step, color=0x3498db)
+            for step in (
+                "Starting training session...",
+                f"{beast[0]} is warming up...",
+                f"{beast[0]} is practicing {beast[3]} techniques...",
+                f"{beast[0]} is building strength...",
+                "Training complete!"
+            )
+        ]
+        await self.bot.animate(ctx, frames, embed)
 
 class GamblingCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.core = self.bot.get_cog('CoreCommands')
     
-    @commands.command()
+    async def claim_jackpot(self, ctx, bet):
+        """Win the progressive jackpot, or refund the winning spin's bet if the win can't be logged"""
+        try:
+            return await self.bot.jackpot.claim(ctx.author.id, games.JACKPOT_SEED)
+        except Exception as e:
+            print(f'Jackpot claim failed for {ctx.author.id}: {e}')
+            await self.bot.wallet.adjust(ctx.author.id, bet)
+            return None
+    
+    def jackpot_footer(self, embed):
+        embed.set_footer(text=f"💎 Progressive jackpot: {self.bot.jackpot.value:,.2f} Eldergems")
+    
+    async def autoplay(self, ctx, title, bet, results, multipliers, stop_loss, take_profit, describe,
+                       hits_jackpot=None):
+        """Settle a run of rounds in one wallet update and report them in a single embed"""
+        deltas = games.autoplay(multipliers, bet, stop_loss, take_profit)
+        settled = await self.bot.wallet.play_rounds(ctx.author.id, bet, deltas)
+        if settled is None:
+            await self.core.get_player_data(ctx.author.id)
+            settled = await self.bot.wallet.play_rounds(ctx.author.id, bet, deltas)
+        played, balance = settled
+        if not played:
+            return await ctx.send("❌ You don't have enough Eldergems!")
+        
+        if played < len(deltas):
+            stopped = "Out of Eldergems"
+        elif played < len(multipliers):
+            stopped = "Stop-loss reached" if sum(deltas) < 0 else "Take-profit reached"
+        else:
+            stopped = None
+        deltas = deltas[:played]
+        net = sum(deltas)
+        self.bot.jackpot.contribute(bet * played * games.JACKPOT_RATE)
+        jackpot = refunded = 0
+        if hits_jackpot is not None:
+            for result in results[:played]:
+                if hits_jackpot(result):
+                    won = await self.claim_jackpot(ctx, bet)
+                    if won is None:
+                        refunded += bet
+                        balance += bet
+                    else:
+                        jackpot += won
+                        balance += won
+        
+        embed = discord.Embed(
+            title=f"{title} Autoplay",
+            description=f"{played} of {len(multipliers)} rounds at {bet:.2f}💎 Eldergems" +
+                        (f"\n**{stopped}**" if stopped else ""),
+            color=0x2ecc71 if net > 0 else 0xe74c3c
+        )
+        embed.add_field(name="Wins", value=f"{sum(1 for delta in deltas if delta > 0)}/{played}", inline=True)
+        embed.add_field(name="Wagered", value=f"{bet * played:.2f}💎", inline=True)
+        embed.add_field(name="Net", value=f"{net:+.2f}💎", inline=True)
+        embed.add_field(name="Biggest Payout", value=f"{bet * max(multipliers[:played]):.2f}💎", inline=True)
+        embed.add_field(name="Balance", value=f"{balance:.2f}💎", inline=True)
+        embed.add_field(
+            name="Rounds",
+            value=" ".join(describe(result) for result in results[:played])[-1024:],
+            inline=False
+        )
+        if jackpot:
+            embed.add_field(name="💎 Progressive Jackpot!", value=f"+{jackpot:,.2f}💎 Eldergems", inline=False)
+            embed.color = 0xf1c40f
+        if refunded:
+            embed.add_field(name="💎 Jackpot Unavailable",
+                            value=f"The pool couldn't be paid, so {refunded:.2f}💎 was refunded", inline=False)
+        self.jackpot_footer(embed)
+        await ctx.send(embed=embed)
+    
+    @commands.hybrid_command(ignore_extra=False, usage='<bet> <heads|tails> [x<rounds>] [stop=<loss>] [take=<profit>]')
     @commands.cooldown(1, 5, commands.BucketType.user)
-    async def coinflip(self, ctx, bet: float, choice: str):
+    @app_commands.choices(choice=option_choices(games.COIN_SIDES))
+    @app_commands.describe(rounds="Autoplay this many flips", stop="Stop autoplay once you've lost this much",
+                           take="Stop autoplay once you've won this much")
+    async def coinflip(self, ctx, bet: float, choice: str, rounds: Optional[AutoplayRounds] = 1,
+                       stop: Optional[StopLoss] = None, take: Optional[TakeProfit] = None):
+        """Bet on heads or tails, once or on autoplay"""
         # Validate input
         choice = choice.lower()
-        if choice not in ['heads', 'tails']:
+        if choice not in games.COIN_SIDES:
             return await ctx.send("❌ Please choose either 'heads' or 'tails'!")
         
-        if bet < 10:
-            return await ctx.send("❌ Minimum bet is 10💎 Eldergems!")
+        if not math.isfinite(bet) or bet < games.COINFLIP_MIN_BET:
+            return await ctx.send(f"❌ Minimum bet is {games.COINFLIP_MIN_BET}💎 Eldergems!")
         
-        # Check if player has enough eldergems
-        player = self.core.get_player_data(ctx.author.id)
-        if player['eldergems'] < bet:
-            return await ctx.send("❌ You don't have enough Eldergems!")
+        if rounds > 1:
+            results = [games.flip_coin() for _ in range(rounds)]
+            multipliers = [games.coinflip_multiplier(choice, result) for result in results]
+            return await self.autoplay(ctx, "🪙 Coin Flip", bet, results, multipliers, stop, take,
+                                       lambda result: "🟢" if result == choice else "🔴")
         
-        # Deduct bet
-        cursor = self.bot.conn.cursor()
-        cursor.execute('UPDATE players SET eldergems = eldergems - ? WHERE user_id = ?', 
-                      (bet, ctx.author.id))
+        # Deduct bet if player has enough eldergems
+        if await self.core.debit(ctx.author.id, bet) is None:
+            return await ctx.send("❌ You don't have enough Eldergems!")
+        self.bot.jackpot.contribute(bet * games.JACKPOT_RATE)
         
-        # Flip animation
         embed = discord.Embed(
             title="🪙 Coin Flip",
             description="Flipping the coin...",
             color=0xf1c40f
         )
-        msg = await ctx.send(embed=embed)
-        await asyncio.sleep(1.5)
+        frames = [embed.copy()]
         
         # Result
-        result = random.choice(['heads', 'tails'])
-        won = choice == result
-        
-        if won:
-            winnings = bet * 1.9  # 1.9x payout (95% return)
-            cursor.execute('UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?', 
-                          (winnings, ctx.author.id))
-            self.bot.conn.commit()
+        result = games.flip_coin()
+        winnings = bet * games.coinflip_multiplier(choice, result)
+        
+        if winnings > 0:
+            await self.bot.wallet.adjust(ctx.author.id, winnings)
             
             embed.description = f"**{result.upper()}!** You won {winnings:.2f}💎 Eldergems!"
             embed.color = 0x2ecc71
         else:
-            self.bot.conn.commit()
             embed.description = f"**{result.upper()}!** You lost {bet:.2f}💎 Eldergems!"
             embed.color = 0xe74c3c
         
-        await msg.edit(embed=embed)
+        self.jackpot_footer(embed)
+        await self.bot.animate(ctx, frames, embed, delay=1.5)
     
-    @commands.command(aliases=['slots'])
+    @commands.hybrid_command(aliases=['slots'], ignore_extra=False,
+                             usage='<bet> [x<rounds>] [stop=<loss>] [take=<profit>]')
     @commands.cooldown(1, 10, commands.BucketType.user)
-    async def slot(self, ctx, bet: float):
+    @app_commands.describe(rounds="Autoplay this many spins", stop="Stop autoplay once you've lost this much",
+                           take="Stop autoplay once you've won this much")
+    async def slot(self, ctx, bet: float, rounds: Optional[AutoplayRounds] = 1,
+                   stop: Optional[StopLoss] = None, take: Optional[TakeProfit] = None):
+        """Spin the slots, once or on autoplay; three 💎 win the progressive jackpot"""
         # Validate input
-        if bet < 20:
-            return await ctx.send("❌ Minimum bet is 20💎 Eldergems!")
-        
-        # Check if player has enough eldergems
-        player = self.core.get_player_data(ctx.author.id)
-        if player['eldergems'] < bet:
+        if not math.isfinite(bet) or bet < games.SLOT_MIN_BET:
+            return await ctx.send(f"❌ Minimum bet is {games.SLOT_MIN_BET}💎 Eldergems!")
+        
+        if rounds > 1:
+            results = [games.spin_slots() for _ in range(rounds)]
+            multipliers = [games.slot_multiplier(reels) for reels in results]
+            return await self.autoplay(ctx, "🎰 Mystical Slots", bet, results, multipliers, stop, take,
+                                       lambda reels: "".join(reels) if games.slot_multiplier(reels) else "·",
+                                       games.hits_jackpot)
+        
+        # Deduct bet if player has enough eldergems
+        if await self.core.debit(ctx.author.id, bet) is None:
             return await ctx.send("❌ You don't have enough Eldergems!")
-        
-        # Deduct bet
-        cursor = self.bot.conn.cursor()
-        cursor.execute('UPDATE players SET eldergems = eldergems - ? WHERE user_id = ?', 
-                      (bet, ctx.author.id))
-        
-        # Slots setup
-        symbols = ['💎', '🔥', '💧', '🌿', '✨', '🌑']
+        self.bot.jackpot.contribute(bet * games.JACKPOT_RATE)
         
         # Initial message
         embed = discord.Embed(
@@ -1012,76 +1734,63 @@ class GamblingCommands(commands.Cog):
             description="Spinning...",
             color=0xf1c40f
         )
-        msg = await ctx.send(embed=embed)
+        frames = [embed.copy()]
         
         # Animation
         for _ in range(3):
-            slot1 = random.choice(symbols)
-            slot2 = random.choice(symbols)
-            slot3 = random.choice(symbols)
-            embed.description = f"[ {slot1} | {slot2} | {slot3} ]"
-            await msg.edit(embed=embed)
-            await asyncio.sleep(0.7)
+            embed.description = f"[ {' | '.join(games.spin_slots())} ]"
+            frames.append(embed.copy())
         
         # Final result
-        slot1 = random.choice(symbols)
-        slot2 = random.choice(symbols)
-        slot3 = random.choice(symbols)
-        
-        # Determine winnings
-        winnings = 0
-        if slot1 == slot2 == slot3:
-            # Jackpot - all three match
-            multiplier = 10 if slot1 == '💎' else 5
-            winnings = bet * multiplier
-            result_msg = f"JACKPOT! All {slot1} match!"
-        elif slot1 == slot2 or slot2 == slot3 or slot1 == slot3:
-            # Two matching
-            winnings = bet * 2
+        reels = games.spin_slots()
+        winnings = bet * games.slot_multiplier(reels)
+        if len(set(reels)) == 1:
+            result_msg = f"JACKPOT! All {reels[0]} match!"
+        elif winnings > 0:
             result_msg = "Two matching symbols!"
         else:
             result_msg = "No matches!"
         
         # Update display
-        embed.description = f"[ {slot1} | {slot2} | {slot3} ]\n\n{result_msg}"
+        embed.description = f"[ {' | '.join(reels)} ]\n\n{result_msg}"
         
         if winnings > 0:
-            cursor.execute('UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?', 
-                          (winnings, ctx.author.id))
+            await self.bot.wallet.adjust(ctx.author.id, winnings)
             embed.add_field(name="Winnings", value=f"{winnings:.2f}💎 Eldergems", inline=False)
             embed.color = 0x2ecc71
         else:
             embed.add_field(name="Result", value=f"You lost {bet:.2f}💎 Eldergems", inline=False)
             embed.color = 0xe74c3c
-        
-        self.bot.conn.commit()
-        await msg.edit(embed=embed)
+
+        if games.hits_jackpot(reels):
+            jackpot = await self.claim_jackpot(ctx, bet)
+            if jackpot is None:
+                embed.add_field(name="💎 Jackpot Unavailable",
+                                value=f"The pool couldn't be paid, so your {bet:.2f}💎 bet was refunded", inline=False)
+            else:
+                embed.add_field(name="💎 Progressive Jackpot!", value=f"+{jackpot:,.2f}💎 Eldergems", inline=False)
+                embed.color = 0xf1c40f
+
+        self.jackpot_footer(embed)
+        await self.bot.animate(ctx, frames, embed, delay=0.7)
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 15, commands.BucketType.user)
+    @app_commands.choices(element=option_choices(battle.ELEMENTS))
     async def elementalwheel(self, ctx, bet: float, element: str):
+        """Bet on the element the wheel lands on"""
         # Validate input
         element = element.capitalize()
         if element not in ELEMENT_EMOJIS:
             return await ctx.send(f"❌ Please choose a valid element: {', '.join(ELEMENT_EMOJIS.keys())}")
         
-        if bet < 50:
-            return await ctx.send("❌ Minimum bet is 50💎 Eldergems!")
+        if not math.isfinite(bet) or bet < games.WHEEL_MIN_BET:
+            return await ctx.send(f"❌ Minimum bet is {games.WHEEL_MIN_BET}💎 Eldergems!")
         
-        # Check if player has enough eldergems
-        player = self.core.get_player_data(ctx.author.id)
-        if player['eldergems'] < bet:
+        # Deduct bet if player has enough eldergems
+        if await self.core.debit(ctx.author.id, bet) is None:
             return await ctx.send("❌ You don't have enough Eldergems!")
-        
-        # Deduct bet
-        cursor = self.bot.conn.cursor()
-        cursor.execute('UPDATE players SET eldergems = eldergems - ? WHERE user_id = ?', 
-                      (bet, ctx.author.id))
-        
-        # Wheel setup
-        wheel_elements = list(ELEMENT_EMOJIS.keys())
-        # Weight distribution (can be adjusted for different odds)
-        weights = [0.18, 0.18, 0.18, 0.18, 0.14, 0.14]  # 18% each for common elements, 14% for rare
+        self.bot.jackpot.contribute(bet * games.JACKPOT_RATE)
         
         # Spin animation
         embed = discord.Embed(
@@ -1089,25 +1798,21 @@ class GamblingCommands(commands.Cog):
             description=f"Spinning the wheel for {bet}💎 Eldergems...\nYou chose: {ELEMENT_EMOJIS[element]} {element}",
             color=0xf1c40f
         )
-        msg = await ctx.send(embed=embed)
+        frames = [embed.copy()]
         
         # Show spinning animation
         for _ in range(3):
-            spinning_display = " → ".join([ELEMENT_EMOJIS[random.choice(wheel_elements)] for _ in range(3)])
+            spinning_display = " → ".join(ELEMENT_EMOJIS[spun] for spun in games.WHEEL_ODDS.sample(3))
             embed.add_field(name="Spinning...", value=spinning_display, inline=False)
-            await msg.edit(embed=embed)
-            await asyncio.sleep(1)
+            frames.append(embed.copy())
             embed.clear_fields()  # Clear for next animation frame
         
         # Final result
-        result_element = random.choices(wheel_elements, weights=weights, k=1)[0]
+        result_element = games.spin_wheel()
         
         # Determine winnings
-        winnings = 0
-        if result_element == element:
-            # Direct match
-            multiplier = 5
-            winnings = bet * multiplier
+        winnings = bet * games.wheel_multiplier(element, result_element)
+        if winnings > 0:
             result_msg = f"You won! {ELEMENT_EMOJIS[element]} matches your choice!"
         else:
             result_msg = f"The wheel landed on {ELEMENT_EMOJIS[result_element]} {result_element}."
@@ -1120,16 +1825,15 @@ class GamblingCommands(commands.Cog):
         )
         
         if winnings > 0:
-            cursor.execute('UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?', 
-                          (winnings, ctx.author.id))
+            await self.bot.wallet.adjust(ctx.author.id, winnings)
             embed.add_field(name="Winnings", value=f"{winnings:.2f}💎 Eldergems", inline=False)
             embed.color = 0x2ecc71
         else:
             embed.add_field(name="Result", value=f"You lost {bet:.2f}💎 Eldergems", inline=False)
             embed.color = 0xe74c3c
         
-        self.bot.conn.commit()
-        await msg.edit(embed=embed)
+        self.jackpot_footer(embed)
+        await self.bot.animate(ctx, frames, embed)
 
 class MarketCommands(commands.Cog):
     def __init__(self, bot):
@@ -1145,10 +1849,24 @@ class MarketCommands(commands.Cog):
             'Element Stone': {'price': 500, 'description': 'Change a beast\'s element', 'type': 'Consumable', 'rarity': 'Rare'},
             'Evolution Essence': {'price': 1000, 'description': 'Required for beast evolution', 'type': 'Material', 'rarity': 'Epic'}
         }
+        self.catalog_version = 0  # Bumped on every change to market_items; keys the cached !market embed
+    
+    def set_price(self, item_name, price):
+        """Reprice a market item, returning its catalog name or None if there is no such item"""
+        for name, data in self.market_items.items():
+            if name.lower() == item_name.lower():
+                data['price'] = price
+                self.catalog_version += 1
+                return name
+        return None
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def market(self, ctx):
+        """List the items for sale"""
+        await ctx.send(embed=self.bot.embeds.get('market', self.catalog_version, self.build_market))
+    
+    def build_market(self):
         embed = discord.Embed(title="🛒 Mythical Market", color=0x2ecc71)
         
         for item, data in self.market_items.items():
@@ -1158,12 +1876,14 @@ class MarketCommands(commands.Cog):
                 inline=False
             )
             
-        embed.set_footer(text="Use !buy <item_name> to purchase")
-        await ctx.send(embed=embed)
+        embed.set_footer(text="Use /buy <item_name> to purchase")
+        return embed
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 5, commands.BucketType.user)
+    @app_commands.autocomplete(item_name=market_item_autocomplete)
     async def buy(self, ctx, *, item_name: str):
+        """Buy an item from the market"""
         # Check if item exists
         item_name = item_name.strip()
         item_data = None
@@ -1174,32 +1894,26 @@ class MarketCommands(commands.Cog):
                 break
                 
         if not item_data:
-            return await ctx.send(f"❌ Item '{item_name}' not found in the market! Use `!market` to see available items.")
+            return await ctx.send(f"❌ Item '{item_name}' not found in the market! Use `/market` to see available items.")
         
-        # Check if player has enough eldergems
-        player = self.core.get_player_data(ctx.author.id)
-        if player['eldergems'] < item_data['price']:
+        # Pay if player has enough eldergems
+        if await self.core.debit(ctx.author.id, item_data['price']) is None:
             return await ctx.send(f"❌ You need {item_data['price']}💎 Eldergems to buy this item!")
         
         # Purchase item
-        cursor = self.bot.conn.cursor()
-        cursor.execute('UPDATE players SET eldergems = eldergems - ? WHERE user_id = ?', 
-                      (item_data['price'], ctx.author.id))
-        
-        # Special handling for Mana Crystal Pack
-        if item_name == 'Mana Crystal Pack':
-            cursor.execute('UPDATE players SET mana_crystals = mana_crystals + 10 WHERE user_id = ?', 
-                         (ctx.author.id,))
-            purchase_message = "Added 10 Mana Crystals to your account!"
-        else:
+        def purchase(cursor):
+            # Special handling for Mana Crystal Pack
+            if item_name == 'Mana Crystal Pack':
+                cursor.execute('UPDATE players SET mana_crystals = mana_crystals + 10 WHERE user_id = ?', 
+                             (ctx.author.id,))
+                return "Added 10 Mana Crystals to your account!"
+            
             # Add to inventory
-            cursor.execute('''
-                INSERT INTO inventory (user_id, item_name, item_type, rarity)
-                VALUES (?, ?, ?, ?)
-            ''', (ctx.author.id, item_name, item_data['type'], item_data.get('rarity', 'Common')))
-            purchase_message = f"Added {item_name} to your inventory!"
+            self.core.add_item(cursor, ctx.author.id, item_name, item_data['type'], item_data.get('rarity', 'Common'))
+            return f"Added {item_name} to your inventory!"
         
-        self.bot.conn.commit()
+        purchase_message = await self.bot.db.shard(ctx.author.id).transaction(purchase)
+        self.bot.players.invalidate(ctx.author.id)
         
         embed = discord.Embed(
             title="🛍️ Purchase Successful",
@@ -1208,17 +1922,16 @@ class MarketCommands(commands.Cog):
         )
         await ctx.send(embed=embed)
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 10, commands.BucketType.user)
     async def sell(self, ctx, inventory_id: int):
+        """Sell one of an inventory item back for eldergems"""
         # Check if item exists in player's inventory
-        cursor = self.bot.conn.cursor()
-        cursor.execute('''
+        item = await self.bot.db.shard(ctx.author.id).fetchone('''
             SELECT item_name, item_type, rarity, quantity 
             FROM inventory 
             WHERE inventory_id = ? AND user_id = ?
         ''', (inventory_id, ctx.author.id))
-        item = cursor.fetchone()
         
         if not item:
             return await ctx.send("❌ Item not found in your inventory!")
@@ -1244,7 +1957,7 @@ class MarketCommands(commands.Cog):
         # Confirm sale
         embed = discord.Embed(
             title="💰 Confirm Sale",
-            description=f"Sell {quantity}x {item_name} ({rarity}) for {sell_price * quantity:.2f}💎 Eldergems?",
+            description=f"Sell 1x {item_name} ({rarity}) for {sell_price:.2f}💎 Eldergems? You have {quantity}.",
             color=0xf1c40f
         )
         
@@ -1253,19 +1966,19 @@ class MarketCommands(commands.Cog):
         confirm_btn = Button(style=discord.ButtonStyle.green, label="Confirm", row=0)
         cancel_btn = Button(style=discord.ButtonStyle.red, label="Cancel", row=0)
         
-        async def confirm_sale(interaction):
-            # Remove item from inventory
-            if quantity > 1:
-                cursor.execute('''
-                    UPDATE inventory 
-                    SET quantity = quantity - 1 
-                    WHERE inventory_id = ? AND user_id = ?
-                ''', (inventory_id, ctx.author.id))
-            else:
-                cursor.execute('''
-                    DELETE FROM inventory 
-                    WHERE inventory_id = ? AND user_id = ?
-                ''', (inventory_id, ctx.author.id))
+        def remove_and_pay(cursor):
+            # Take one off the stack as it is now; the quantity read above may be stale by the time Confirm is clicked
+            cursor.execute('''
+                UPDATE inventory 
+                SET quantity = quantity - 1 
+                WHERE inventory_id = ? AND user_id = ? AND quantity > 0
+            ''', (inventory_id, ctx.author.id))
+            if cursor.rowcount != 1:
+                return False  # Sold, used or sold from another view in the meantime
+            cursor.execute('''
+                DELETE FROM inventory 
+                WHERE inventory_id = ? AND quantity <= 0
+            ''', (inventory_id,))
             
             # Add eldergems
             cursor.execute('''
@@ -1273,12 +1986,20 @@ class MarketCommands(commands.Cog):
                 SET eldergems = eldergems + ? 
                 WHERE user_id = ?
             ''', (sell_price, ctx.author.id))
-            
-            self.bot.conn.commit()
-            
-            embed.title = "💰 Item Sold"
-            embed.description = f"Sold {item_name} for {sell_price:.2f}💎 Eldergems!"
-            embed.color = 0x2ecc71
+            return True
+        
+        async def confirm_sale(interaction):
+            if await self.bot.db.shard(ctx.author.id).transaction(remove_and_pay):
+                self.bot.players.invalidate(ctx.author.id)
+                self.bot.leaderboards.eldergems.adjust(ctx.author.id, sell_price)
+                
+                embed.title = "💰 Item Sold"
+                embed.description = f"Sold {item_name} for {sell_price:.2f}💎 Eldergems!"
+                embed.color = 0x2ecc71
+            else:
+                embed.title = "❌ Item Gone"
+                embed.description = f"You no longer have any {item_name} to sell."
+                embed.color = 0xe74c3c
             
             for button in view.children:
                 button.disabled = True
@@ -1308,42 +2029,43 @@ class GuildCommands(commands.Cog):
         self.bot = bot
         self.core = self.bot.get_cog('CoreCommands')
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 30, commands.BucketType.user)
     async def createguild(self, ctx, *, guild_name: str):
+        """Found a guild for 1000 eldergems"""
         if len(guild_name) < 3 or len(guild_name) > 32:
             return await ctx.send("❌ Guild name must be between 3 and 32 characters!")
         
         # Check if player is already in a guild
-        player = self.core.get_player_data(ctx.author.id)
+        player = await self.core.get_player_data(ctx.author.id)
         if player['guild_id'] is not None:
             return await ctx.send("❌ You're already in a guild! Leave your current guild first.")
         
-        # Check if player has enough eldergems
-        if player['eldergems'] < 1000:
-            return await ctx.send("❌ Creating a guild costs 1000💎 Eldergems!")
-        
         # Check if guild name exists
-        cursor = self.bot.conn.cursor()
-        cursor.execute('SELECT guild_id FROM guilds WHERE guild_name = ?', (guild_name,))
-        if cursor.fetchone():
+        if await self.bot.db.main.fetchone('SELECT guild_id FROM guilds WHERE guild_name = ? COLLATE NOCASE', (guild_name,)):
             return await ctx.send("❌ A guild with that name already exists!")
         
-        # Create guild
-        cursor.execute('UPDATE players SET eldergems = eldergems - 1000 WHERE user_id = ?',
-                      (ctx.author.id,))
+        # Pay if player has enough eldergems
+        if await self.core.debit(ctx.author.id, 1000) is None:
+            return await ctx.send("❌ Creating a guild costs 1000💎 Eldergems!")
         
-        cursor.execute('''
-            INSERT INTO guilds (guild_name, leader_id)
-            VALUES (?, ?)
-        ''', (guild_name, ctx.author.id))
-        guild_id = cursor.lastrowid
+        # Create guild (guilds live on the main database, the player on their shard)
+        try:
+            guild_id = await self.bot.db.main.insert('''
+                INSERT INTO guilds (guild_name, leader_id)
+                VALUES (?, ?)
+            ''', (guild_name, ctx.author.id))
+        except sqlite3.IntegrityError:
+            # Someone took the name while we were paying
+            await self.bot.wallet.adjust(ctx.author.id, 1000)
+            return await ctx.send("❌ A guild with that name already exists!")
         
-        # Update player's guild
-        cursor.execute('UPDATE players SET guild_id = ? WHERE user_id = ?',
-                      (guild_id, ctx.author.id))
+        self.bot.leaderboards.guilds.set(guild_id, 0)
         
-        self.bot.conn.commit()
+        # Update player's guild
+        await self.bot.db.shard(ctx.author.id).execute('UPDATE players SET guild_id = ? WHERE user_id = ?',
+                                                       (guild_id, ctx.author.id))
+        self.bot.players.invalidate(ctx.author.id)
         
         embed = discord.Embed(
             title="🏰 Guild Created",
@@ -1356,18 +2078,17 @@ class GuildCommands(commands.Cog):
         
         await ctx.send(embed=embed)
     
-    @commands.command()
+    @commands.hybrid_command()
     @commands.cooldown(1, 10, commands.BucketType.user)
     async def joinguild(self, ctx, *, guild_name: str):
+        """Join an existing guild"""
         # Check if player is already in a guild
-        player = self.core.get_player_data(ctx.author.id)
+        player = await self.core.get_player_data(ctx.author.id)
         if player['guild_id'] is not None:
             return await ctx.send("❌ You're already in a guild! Leave your current guild first.")
         
         # Check if guild exists
-        cursor = self.bot.conn.cursor()
-        cursor.execute('SELECT guild_id, members_count FROM guilds WHERE guild_name = ?', (guild_name,))
-        guild = cursor.fetchone()
+        guild = await self.bot.db.main.fetchone('SELECT guild_id, members_count FROM guilds WHERE guild_name = ? COLLATE NOCASE', (guild_name,))
         
         if not guild:
             return await ctx.send("❌ Guild not found!")
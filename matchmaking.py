@@ -0,0 +1,221 @@
+import asyncio
+import math
+import time
+
+from leaderboard import Leaderboard
+from metrics import LatencyWindow
+
+RATING_START = 1500.0
+RATING_DEVIATION_START = 350.0  # Also the ceiling an idle beast's deviation decays back to
+RATING_DEVIATION_MIN = 30.0
+RATING_DECAY = 35.0  # Deviation regained per sqrt(day) idle; ~100 days from settled back to new
+GLICKO_Q = math.log(10) / 400
+
+QUEUE_WINDOW = 100  # Rating gap accepted the moment a ticket joins
+QUEUE_WINDOW_GROWTH = 25  # Extra rating gap accepted per second waited
+QUEUE_MAX_WAIT = 60  # Seconds after which a ticket accepts any opponent
+QUEUE_TIMEOUT = 300  # Seconds before an unmatched ticket is dropped
+QUEUE_TICK = 1.0  # Seconds between matching passes over the whole pool
+QUEUE_SCAN = 16  # Neighbours fetched per step when walking the pool outward
+
+
+def _g(deviation):
+    return 1 / math.sqrt(1 + 3 * GLICKO_Q ** 2 * deviation ** 2 / math.pi ** 2)
+
+
+def expected_score(rating, opponent_rating, opponent_deviation):
+    return 1 / (1 + 10 ** (-_g(opponent_deviation) * (rating - opponent_rating) / 400))
+
+
+def glicko_update(rating, deviation, opponent_rating, opponent_deviation, score):
+    """Glicko-1 rating and deviation after one game scored 1, 0.5 or 0"""
+    g = _g(opponent_deviation)
+    expected = expected_score(rating, opponent_rating, opponent_deviation)
+    d_squared = 1 / (GLICKO_Q ** 2 * g ** 2 * expected * (1 - expected))
+    precision = 1 / deviation ** 2 + 1 / d_squared
+    new_rating = rating + GLICKO_Q / precision * g * (score - expected)
+    return new_rating, max(RATING_DEVIATION_MIN, math.sqrt(1 / precision))
+
+
+def decayed_deviation(deviation, idle_days):
+    """Deviation grown back after idle_days without a rated match"""
+    return min(RATING_DEVIATION_START, math.sqrt(deviation ** 2 + RATING_DECAY ** 2 * max(0.0, idle_days)))
+
+
+class Ticket:
+    __slots__ = ('ticket_id', 'user_id', 'beast', 'rating', 'deviation', 'joined', 'ctx')
+
+    def __init__(self, ticket_id, user_id, beast, rating, deviation, joined, ctx):
+        self.ticket_id = ticket_id
+        self.user_id = user_id
+        self.beast = beast
+        self.rating = rating
+        self.deviation = deviation
+        self.joined = joined
+        self.ctx = ctx
+
+    def window(self, now):
+        """Largest rating gap this ticket accepts after waiting until now"""
+        waited = now - self.joined
+        if waited >= QUEUE_MAX_WAIT:
+            return math.inf
+        return QUEUE_WINDOW + QUEUE_WINDOW_GROWTH * waited
+
+
+class MatchQueue:
+    """PvP tickets waiting for an opponent, indexed by rating.
+
+    The pool is a Leaderboard keyed by ticket, so a ticket's position in
+    rating order and its neighbours on either side are O(log n) lookups.
+    Pairing walks outward from the ticket until the gap exceeds its search
+    window. Both tickets must accept the gap, and windows widen the longer
+    a ticket waits until, after QUEUE_MAX_WAIT, any opponent will do. A
+    ticket is matched on joining if possible, otherwise by a pass over the
+    pool every QUEUE_TICK, oldest tickets first. ``on_match(a, b)`` and
+    ``on_timeout(ticket)`` are coroutines supplied by the bot.
+    """
+    def __init__(self, on_match, on_timeout):
+        self.on_match = on_match
+        self.on_timeout = on_timeout
+        self.pool = Leaderboard(scale=100)
+        self.tickets = {}  # ticket_id -> Ticket, oldest first
+        self.by_user = {}  # user_id -> Ticket
+        self.wait = LatencyWindow()  # Seconds from joining to being matched
+        self.matched = 0
+        self.timeouts = 0
+        self._next_id = 0
+        self._task = None
+        self._running = set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            await asyncio.wait(self._running)
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def ticket(self, user_id):
+        return self.by_user.get(user_id)
+
+    def join(self, user_id, beast, rating, deviation, ctx):
+        """Queue a beast, returning its Ticket, or None if the user is already queued"""
+        if user_id in self.by_user:
+            return None
+        self._next_id += 1
+        ticket = Ticket(self._next_id, user_id, beast, rating, deviation, time.monotonic(), ctx)
+        self.tickets[ticket.ticket_id] = ticket
+        self.by_user[user_id] = ticket
+        self.pool.set(ticket.ticket_id, rating)
+        opponent = self._find(ticket, ticket.joined)
+        if opponent is not None:
+            self._pair(ticket, opponent, ticket.joined)
+        return ticket
+
+    def leave(self, user_id):
+        ticket = self.by_user.get(user_id)
+        if ticket is not None:
+            self._remove(ticket)
+        return ticket
+
+    def _remove(self, ticket):
+        del self.tickets[ticket.ticket_id]
+        del self.by_user[ticket.user_id]
+        self.pool.remove(ticket.ticket_id)
+
+    def _neighbours(self, rank, step):
+        """Queued tickets moving away from rank, nearest first; step -1 walks up, 1 down"""
+        if step < 0:
+            end = rank - 1
+            while end > 0:
+                start = max(0, end - QUEUE_SCAN)
+                for _, ticket_id, _ in reversed(self.pool.page(start, end - start)):
+                    yield self.tickets[ticket_id]
+                end = start
+        else:
+            start = rank
+            while True:
+                entries = self.pool.page(start, QUEUE_SCAN)
+                if not entries:
+                    return
+                for _, ticket_id, _ in entries:
+                    yield self.tickets[ticket_id]
+                start += len(entries)
+
+    def _find(self, ticket, now):
+        """Closest queued ticket both sides accept, or None"""
+        window = ticket.window(now)
+        rank = self.pool.rank(ticket.ticket_id)
+        best, best_gap = None, math.inf
+        for step in (-1, 1):
+            # Gaps only grow moving away, so stop at the first one past the window or the best so far
+            for other in self._neighbours(rank, step):
+                gap = abs(other.rating - ticket.rating)
+                if gap > window or gap >= best_gap:
+                    break
+                if other.user_id != ticket.user_id and gap <= other.window(now):
+                    best, best_gap = other, gap
+                    break
+        return best
+
+    def _pair(self, ticket, opponent, now):
+        self._remove(ticket)
+        self._remove(opponent)
+        self.wait.record(now - ticket.joined)
+        self.wait.record(now - opponent.joined)
+        self.matched += 1
+        self._spawn(self.on_match(opponent, ticket))
+
+    async def _guard(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(f"Matchmaking callback failed: {e}")
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(self._guard(coro))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    def match_all(self, now=None):
+        """One matching pass over the pool, returning the number of matches made"""
+        now = time.monotonic() if now is None else now
+        matched = self.matched
+        for ticket in list(self.tickets.values()):
+            if ticket.ticket_id not in self.tickets:
+                continue  # Already paired earlier in this pass
+            if now - ticket.joined >= QUEUE_TIMEOUT:
+                self._remove(ticket)
+                self.timeouts += 1
+                self._spawn(self.on_timeout(ticket))
+                continue
+            opponent = self._find(ticket, now)
+            if opponent is not None:
+                self._pair(ticket, opponent, now)
+        return self.matched - matched
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(QUEUE_TICK)
+            try:
+                self.match_all()
+            except Exception as e:
+                print(f"Matchmaking pass failed: {e}")
+
+    def stats(self):
+        p50, p99 = self.wait.summary()
+        return {
+            'depth': len(self.tickets),
+            'matched': self.matched,
+            'timeouts': self.timeouts,
+            'wait_p50': p50 / 1000,
+            'wait_p99': p99 / 1000,
+        }
@@ -0,0 +1,23 @@
+from collections import deque
+
+
+class LatencyWindow:
+    """Rolling window of latency samples (seconds) with percentile lookups"""
+    def __init__(self, size=2048):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+    def summary(self):
+        """Return (p50, p99) in milliseconds"""
+        return self.percentile(50) * 1000, self.percentile(99) * 1000
@@ -0,0 +1,191 @@
+"""Versioned schema migrations.
+
+The schema version lives in sqlite's ``PRAGMA user_version``. Each migration
+is applied in its own short transaction, so an existing database is upgraded
+in place one step at a time and never holds the write lock for the whole run.
+Never edit a migration that has shipped; append a new one instead.
+"""
+
+MIGRATIONS = [
+    (1, 'initial schema', [
+        '''
+        CREATE TABLE IF NOT EXISTS players (
+            user_id INTEGER PRIMARY KEY,
+            eldergems REAL DEFAULT 1000.0,
+            mana_crystals INTEGER DEFAULT 50,
+            guild_id INTEGER DEFAULT NULL,
+            rank TEXT DEFAULT 'Novice',
+            last_daily_claim TIMESTAMP DEFAULT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS beasts (
+            beast_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            beast_name TEXT,
+            beast_type TEXT,
+            element TEXT,
+            rarity TEXT,
+            level INTEGER DEFAULT 1,
+            experience INTEGER DEFAULT 0,
+            power INTEGER,
+            health INTEGER,
+            magic INTEGER,
+            equipped_item TEXT DEFAULT NULL,
+            FOREIGN KEY (user_id) REFERENCES players(user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS inventory (
+            inventory_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            item_name TEXT,
+            item_type TEXT,
+            rarity TEXT,
+            quantity INTEGER DEFAULT 1,
+            FOREIGN KEY (user_id) REFERENCES players(user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS guilds (
+            guild_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_name TEXT UNIQUE,
+            leader_id INTEGER,
+            members_count INTEGER DEFAULT 1,
+            guild_level INTEGER DEFAULT 1,
+            guild_power INTEGER DEFAULT 0,
+            FOREIGN KEY (leader_id) REFERENCES players(user_id)
+        )
+        ''',
+    ]),
+    (2, 'per-user and guild name indexes', [
+        # !beasts and the level-ordered views
+        'CREATE INDEX IF NOT EXISTS idx_beasts_user_level ON beasts (user_id, level)',
+        # Strongest beast lookups; queries must use the exact expression power + health + magic
+        'CREATE INDEX IF NOT EXISTS idx_beasts_user_strength ON beasts (user_id, (power + health + magic))',
+        # !inventory ordering
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user ON inventory (user_id, rarity, item_name)',
+        # Case-insensitive guild name lookups (WHERE guild_name = ? COLLATE NOCASE)
+        'CREATE INDEX IF NOT EXISTS idx_guilds_name_nocase ON guilds (guild_name COLLATE NOCASE)',
+    ]),
+    (3, 'wallet group-commit sequence', [
+        # Bumped by every wallet group commit so readers can tell which buffered deltas a row already includes
+        'CREATE TABLE IF NOT EXISTS wallet_flushes (id INTEGER PRIMARY KEY CHECK (id = 0), seq INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO wallet_flushes (id, seq) VALUES (0, 0)',
+    ]),
+    (4, 'stacked inventory', [
+        # Fold duplicate rows into the oldest row of each stack
+        '''
+        UPDATE inventory SET quantity = (
+            SELECT SUM(dup.quantity) FROM inventory AS dup
+            WHERE dup.user_id = inventory.user_id
+              AND dup.item_name = inventory.item_name
+              AND dup.rarity IS inventory.rarity
+        )
+        WHERE inventory_id IN (
+            SELECT MIN(inventory_id) FROM inventory
+            GROUP BY user_id, item_name, rarity
+            HAVING COUNT(*) > 1
+        )
+        ''',
+        '''
+        DELETE FROM inventory WHERE inventory_id NOT IN (
+            SELECT MIN(inventory_id) FROM inventory
+            GROUP BY user_id, item_name, rarity
+        )
+        ''',
+        # The stack key doubles as the !inventory ordering index
+        'DROP INDEX IF EXISTS idx_inventory_user',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_stack ON inventory (user_id, rarity, item_name)',
+    ]),
+    (5, 'beast matchmaking ratings', [
+        # Glicko rating per beast; rated_at lets the deviation grow back while a beast sits out
+        'ALTER TABLE beasts ADD COLUMN rating REAL NOT NULL DEFAULT 1500',
+        'ALTER TABLE beasts ADD COLUMN rating_deviation REAL NOT NULL DEFAULT 350',
+        'ALTER TABLE beasts ADD COLUMN rated_at TEXT',
+    ]),
+    (6, 'battle replays', [
+        # Append-only; data is a replay.Recorder blob, a few dozen bytes per battle
+        '''
+        CREATE TABLE IF NOT EXISTS battle_replays (
+            replay_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            opponent_id INTEGER,
+            beast_id INTEGER,
+            kind INTEGER NOT NULL,
+            outcome INTEGER,
+            created_at INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_replays_user ON battle_replays (user_id, replay_id)',
+    ]),
+    (7, 'progressive jackpot', [
+        # One pool row, used on the main database; the seed matches games.JACKPOT_SEED
+        '''
+        CREATE TABLE IF NOT EXISTS jackpot (
+            jackpot_id INTEGER PRIMARY KEY,
+            amount REAL NOT NULL,
+            wins INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        'INSERT OR IGNORE INTO jackpot (jackpot_id, amount) VALUES (1, 1000.0)',
+        '''
+        CREATE TABLE IF NOT EXISTS jackpot_wins (
+            win_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            won_at TEXT NOT NULL,
+            paid_at TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_jackpot_unpaid ON jackpot_wins (win_id) WHERE paid_at IS NULL',
+        # On the winner's shard; the primary key makes crediting a win idempotent
+        '''
+        CREATE TABLE IF NOT EXISTS jackpot_payouts (
+            win_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL
+        )
+        ''',
+    ]),
+    (8, 'filtered page indexes', [
+        # Keyset pages of !beasts filtered by element or rarity; beast_id rides along as the rowid
+        'CREATE INDEX IF NOT EXISTS idx_beasts_user_element_level ON beasts (user_id, element, level)',
+        'CREATE INDEX IF NOT EXISTS idx_beasts_user_rarity_level ON beasts (user_id, rarity, level)',
+        # !inventory sorted by name
+        'CREATE INDEX IF NOT EXISTS idx_inventory_user_name ON inventory (user_id, item_name)',
+    ]),
+]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn):
+    """Bring the database up to the latest version, returning the versions applied"""
+    applied = []
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # manage transactions explicitly
+    try:
+        current = schema_version(conn)
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append((version, description))
+    finally:
+        conn.isolation_level = isolation_level
+    return applied
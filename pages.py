@@ -0,0 +1,87 @@
+PAGE_SIZE = 10  # Rows per page; well under Discord's 25 embed fields
+
+
+class KeysetPager:
+    """Pages through one query's rows by remembering the sort key at each edge.
+
+    ``key`` is the tuple of ORDER BY expressions, ending in a unique column
+    so the order is total; every expression sorts the same way. The next
+    page is the rows after the last row's key, ``WHERE (k1, k2) < (?, ?)``
+    for a descending order, and the previous page is the rows before the
+    first row's key read in reverse. With an index on the filter columns
+    followed by the key, each page is one index seek and PAGE_SIZE + 1 rows,
+    however many rows the query matches in total.
+    """
+    def __init__(self, db, columns, table, where, params, key, descending=True, page_size=PAGE_SIZE):
+        self.db = db
+        self.columns = columns
+        self.table = table
+        self.where = where
+        self.params = tuple(params)
+        self.key = key
+        self.descending = descending
+        self.page_size = page_size
+        self.page = 0  # Index of the page last fetched
+        self.rows = []
+        self.has_next = False
+        self._first = None  # Key of the first and last rows on the current page
+        self._last = None
+
+    def _sql(self, after, forward):
+        # Walking backwards flips both the comparison and the order, then the page is reversed
+        descending = self.descending == forward
+        where = self.where
+        if after is not None:
+            keys = ', '.join(self.key)
+            # The redundant bound on the first key lets SQLite seek expression indexes too
+            where += f" AND {self.key[0]} {'<=' if descending else '>='} ?"
+            where += f" AND ({keys}) {'<' if descending else '>'} ({', '.join('?' * len(self.key))})"
+        order = ', '.join(f"{expression} {'DESC' if descending else 'ASC'}" for expression in self.key)
+        return f'''
+            SELECT {self.columns}, {', '.join(self.key)} FROM {self.table}
+            WHERE {where} ORDER BY {order} LIMIT ?
+        '''
+
+    async def _fetch(self, after, forward):
+        params = self.params + ((after[0], *after) if after is not None else ()) + (self.page_size + 1,)
+        rows = await self.db.fetchall(self._sql(after, forward), params)
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if not forward:
+            rows.reverse()
+        return rows, more
+
+    def _keep(self, rows):
+        self.rows = [tuple(row)[:-len(self.key)] for row in rows]
+        if rows:
+            self._first = tuple(rows[0])[-len(self.key):]
+            self._last = tuple(rows[-1])[-len(self.key):]
+
+    async def first(self):
+        rows, self.has_next = await self._fetch(None, True)
+        self.page = 0
+        self._keep(rows)
+        return self.rows
+
+    async def next(self):
+        if not self.has_next:
+            return self.rows
+        rows, self.has_next = await self._fetch(self._last, True)
+        if not rows:
+            return self.rows
+        self.page += 1
+        self._keep(rows)
+        return self.rows
+
+    async def prev(self):
+        if self.page == 0:
+            return self.rows
+        rows, more = await self._fetch(self._first, False)
+        if not rows:
+            return await self.first()
+        self.page -= 1
+        self.has_next = True
+        self._keep(rows)
+        if not more:
+            self.page = 0  # Rows were deleted since; this is the first page now
+        return self.rows
@@ -0,0 +1,129 @@
+import random
+import struct
+
+import battle
+
+REPLAY_VERSION = 1
+KIND_BATTLE, KIND_AUTOBATTLE, KIND_RANKED = 0, 1, 2
+_AUTO = 1  # Header flag: the player's seat was played by battle.ai_action
+_NO_REPLY = 3  # Reply action code when the opponent fell before moving
+_HEADER = struct.Struct('<BBQ')  # version, flags, seed
+
+
+def new_seed():
+    return random.getrandbits(64)
+
+
+def _put_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Recorder:
+    """Packs a battle's rounds as it is played, about three bytes per round.
+
+    Each round is one byte holding the player's action and the reply
+    (bits 0-1 and 2-3), then a varint of damage for each attack or special.
+    With the seed and both beasts' starting stats that is enough for the
+    engine to play the battle again, and the stored damage lets a replay
+    notice if the rules have changed since.
+    """
+    __slots__ = ('seed', 'player', 'opponent', 'auto', 'rounds')
+
+    def __init__(self, seed, player, opponent, auto=False):
+        self.seed = seed
+        self.player = player
+        self.opponent = opponent
+        self.auto = auto
+        self.rounds = bytearray()
+
+    def record(self, action, events):
+        reply = events[1][1] if len(events) > 1 else _NO_REPLY
+        self.rounds.append(action | reply << 2)
+        for _, event_action, damage, _ in events:
+            if event_action != battle.DEFEND:
+                _put_varint(self.rounds, damage)
+
+    def pack(self):
+        out = bytearray(_HEADER.pack(REPLAY_VERSION, _AUTO if self.auto else 0, self.seed))
+        for beast in (self.player, self.opponent):
+            name = beast.name.encode()[:255]
+            for value in (beast.element, beast.level, beast.power, beast.health, beast.magic):
+                _put_varint(out, value)
+            out.append(len(name))
+            out += name
+        out += self.rounds
+        return bytes(out)
+
+
+def unpack(data):
+    """(seed, player, opponent, auto, rounds) from a packed replay; rounds are (action, reply, damages)"""
+    version, flags, seed = _HEADER.unpack_from(data)
+    if version != REPLAY_VERSION:
+        raise ValueError(f'unknown replay version {version}')
+    pos = _HEADER.size
+    beasts = []
+    for _ in range(2):
+        stats = []
+        for _ in range(5):
+            value, pos = _get_varint(data, pos)
+            stats.append(value)
+        length = data[pos]
+        name = bytes(data[pos + 1:pos + 1 + length]).decode()
+        pos += 1 + length
+        element, level, power, health, magic = stats
+        beasts.append(battle.Beast(None, name, element, level, power, health, magic, None))
+    rounds = []
+    while pos < len(data):
+        action, reply = data[pos] & 3, data[pos] >> 2
+        pos += 1
+        damages = []
+        for move in (action, reply):
+            if move not in (battle.DEFEND, _NO_REPLY):
+                damage, pos = _get_varint(data, pos)
+                damages.append(damage)
+        rounds.append((action, reply, damages))
+    return seed, beasts[0], beasts[1], bool(flags & _AUTO), rounds
+
+
+def play(data):
+    """Re-run a packed replay through the engine.
+
+    Returns (state, rounds, diverged_at): the final BattleState, the events
+    of each round as step returned them, and the first round whose actions
+    or damage differ from the recording (None when the replay matches).
+    """
+    seed, player, opponent, auto, recorded = unpack(data)
+    state = battle.BattleState(player, opponent)
+    rng = random.Random(seed)
+    rounds = []
+    diverged_at = None
+    for number, (action, reply, damages) in enumerate(recorded, 1):
+        # Auto battles chose the player's moves with the AI, drawing from the same rng
+        if auto and battle.ai_action(state, rng) != action and diverged_at is None:
+            diverged_at = number
+        try:
+            events = battle.step(state, action, rng)
+        except ValueError:
+            return state, rounds, diverged_at or number
+        rounds.append(events)
+        replayed = [damage for _, move, damage, _ in events if move != battle.DEFEND]
+        replayed_reply = events[1][1] if len(events) > 1 else _NO_REPLY
+        if diverged_at is None and (replayed != damages or replayed_reply != reply):
+            diverged_at = number
+        if state.outcome is not None:
+            break
+    return state, rounds, diverged_at
@@ -0,0 +1,141 @@
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+
+import games
+
+RTP_ROUNDS = 10 ** 8  # Rounds simulated per game
+RTP_CHUNK = 1 << 24  # Rounds drawn together; bounds memory at a few hundred MB
+RTP_TOLERANCE = 0.002  # Allowed gap between a game's return and its TARGET_RTP
+RTP_Z = 4.0  # Standard errors the simulated return may stray from the exact one
+
+
+def _uniform(count):
+    def draw(rng, n):
+        return rng.integers(0, count, n)
+    return draw
+
+
+def _slot_draw(rng, n):
+    # Each reel is an independent uniform symbol, as in games.spin_slots
+    symbols = len(games.SLOT_SYMBOLS)
+    reels = rng.integers(0, symbols, (games.SLOT_REELS, n))
+    index = reels[0]
+    for reel in reels[1:]:
+        index = index * symbols + reel
+    return index
+
+
+def _wheel_draw(rng, n):
+    return games.WHEEL_ODDS.sample_indices(n, rng)
+
+
+def outcome_space():
+    """Per game: (outcomes, their probabilities, a draw(rng, n) of outcome indices)"""
+    weights = np.asarray(games.WHEEL_ODDS.weights)
+    slots = list(itertools.product(games.SLOT_SYMBOLS, repeat=games.SLOT_REELS))
+    return {
+        'coinflip': (games.COIN_SIDES, np.full(len(games.COIN_SIDES), 1 / len(games.COIN_SIDES)),
+                     _uniform(len(games.COIN_SIDES))),
+        'slot': (slots, np.full(len(slots), 1 / len(slots)), _slot_draw),
+        'wheel': (games.WHEEL_ODDS.items, weights / weights.sum(), _wheel_draw),
+    }
+
+
+def payout_table(game, outcomes):
+    """Multiplier for every (choice, outcome), computed by the production payout functions"""
+    if game == 'coinflip':
+        return {choice: [games.coinflip_multiplier(choice, result) for result in outcomes]
+                for choice in games.COIN_SIDES}
+    if game == 'slot':
+        return {None: [games.slot_multiplier(reels) for reels in outcomes]}
+    return {choice: [games.wheel_multiplier(choice, result) for result in outcomes]
+            for choice in games.WHEEL_ODDS.items}
+
+
+def verify(game, rounds=RTP_ROUNDS, seed=None, tolerance=RTP_TOLERANCE, chunk=RTP_CHUNK):
+    """Simulate rounds of one game and check every bet choice's return.
+
+    Outcomes are drawn with NumPy and tallied; each choice's payouts come
+    from evaluating the games.py multiplier functions once per possible
+    outcome, so the simulation and the bot share one set of rules. Returns
+    a list of result dicts, one per choice, with 'ok' False when the exact
+    or simulated return misses TARGET_RTP by more than tolerance, or the
+    simulation disagrees with the exact return by more than RTP_Z standard
+    errors (which would mean the draws no longer match games.py's odds).
+    """
+    outcomes, probabilities, draw = outcome_space()[game]
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(len(outcomes), dtype=np.int64)
+    started = time.perf_counter()
+    done = 0
+    while done < rounds:
+        n = min(chunk, rounds - done)
+        counts += np.bincount(draw(rng, n), minlength=len(outcomes))
+        done += n
+    seconds = time.perf_counter() - started
+
+    results = []
+    for choice, payouts in payout_table(game, outcomes).items():
+        payouts = np.asarray(payouts, dtype=np.float64)
+        exact = float(probabilities @ payouts)
+        mean = float(counts @ payouts) / rounds
+        variance = float(counts @ payouts ** 2) / rounds - mean ** 2
+        error = (variance / rounds) ** 0.5
+        target = games.TARGET_RTP[game][choice]
+        problems = []
+        for label, value in (('exact', exact), ('simulated', mean)):
+            if abs(value - target) > tolerance:
+                problems.append(f'{label} RTP {value:.4%} is off target {target:.4%}')
+        if abs(mean - exact) > RTP_Z * max(error, 1e-12):
+            problems.append(f'simulated RTP {mean:.4%} is {abs(mean - exact) / error:.1f} standard errors '
+                            f'from the exact {exact:.4%}')
+        results.append({
+            'game': game,
+            'choice': choice,
+            'rounds': rounds,
+            'rtp': mean,
+            'ci': (mean - 1.96 * error, mean + 1.96 * error),
+            'exact': exact,
+            'target': target,
+            'variance': variance,
+            'spins_per_second': rounds / seconds,
+            'ok': not problems,
+            'problems': problems,
+        })
+    return results
+
+
+def format_results(results):
+    lines = []
+    for result in results:
+        label = result['game'] if result['choice'] is None else f"{result['game']} {result['choice']}"
+        low, high = result['ci']
+        lines.append(
+            f"{label:<16} RTP {result['rtp']:8.4%} (95% CI {low:.4%}-{high:.4%}) exact {result['exact']:8.4%} "
+            f"target {result['target']:8.4%} var {result['variance']:7.3f} "
+            f"{result['spins_per_second'] / 1e6:6.1f}M spins/s {'ok' if result['ok'] else 'FAIL'}"
+        )
+        lines.extend(f'    {problem}' for problem in result['problems'])
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo return-to-player check for the gambling games')
+    parser.add_argument('games', nargs='*', help=f'games to check: {", ".join(games.TARGET_RTP)} (default all)')
+    parser.add_argument('--rounds', type=float, default=RTP_ROUNDS, help='rounds per game')
+    parser.add_argument('--tolerance', type=float, default=RTP_TOLERANCE)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    for game in args.games:
+        if game not in games.TARGET_RTP:
+            parser.error(f'unknown game {game!r}')
+    failed = False
+    for game in args.games or games.TARGET_RTP:
+        results = verify(game, int(args.rounds), args.seed, args.tolerance)
+        print(format_results(results))
+        failed |= not all(result['ok'] for result in results)
+    sys.exit(1 if failed else 0)
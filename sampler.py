@@ -0,0 +1,73 @@
+import random
+
+
+class AliasTable:
+    """Weighted choice over a fixed table in O(1) per draw (Walker's alias method).
+
+    Building the table is O(n): every column of the table holds one item's
+    scaled probability plus an alias that takes the rest of the column,
+    so a draw is one uniform column pick and one biased coin flip. Weights
+    need not sum to 1. Build a table once per odds table and reuse it.
+    """
+    __slots__ = ('items', 'weights', 'prob', 'alias')
+
+    def __init__(self, items, weights):
+        items = tuple(items)
+        weights = tuple(float(weight) for weight in weights)
+        if not items or len(items) != len(weights):
+            raise ValueError('need one weight per item')
+        total = sum(weights)
+        if total <= 0 or min(weights) < 0:
+            raise ValueError('weights must be non-negative with a positive sum')
+        count = len(items)
+        scaled = [weight * count / total for weight in weights]
+        prob = [1.0] * count
+        alias = list(range(count))
+        small = [index for index, value in enumerate(scaled) if value < 1]
+        large = [index for index, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            prob[low] = scaled[low]
+            alias[low] = high
+            scaled[high] -= 1 - scaled[low]
+            (small if scaled[high] < 1 else large).append(high)
+        # Whatever is left is 1 up to rounding error and keeps prob 1.0
+        self.items = items
+        self.weights = weights
+        self.prob = tuple(prob)
+        self.alias = tuple(alias)
+
+    @classmethod
+    def from_dict(cls, table):
+        """Build from an {item: weight} mapping"""
+        return cls(table.keys(), table.values())
+
+    def __len__(self):
+        return len(self.items)
+
+    def probability(self, item):
+        return self.weights[self.items.index(item)] / sum(self.weights)
+
+    def pick(self, rng=random):
+        column = int(rng.random() * len(self.items))
+        if rng.random() < self.prob[column]:
+            return self.items[column]
+        return self.items[self.alias[column]]
+
+    def sample(self, n, rng=random):
+        """n independent draws as a list; rng needs ``random()`` (random.Random or the random module)"""
+        items, prob, alias = self.items, self.prob, self.alias
+        count = len(items)
+        draw = rng.random
+        out = []
+        for _ in range(n):
+            column = int(draw() * count)
+            out.append(items[column] if draw() < prob[column] else items[alias[column]])
+        return out
+
+    def sample_indices(self, n, generator):
+        """n draws as a NumPy array of item indices, from a numpy.random.Generator"""
+        import numpy as np
+        columns = generator.integers(0, len(self.items), n)
+        keep = generator.random(n) < np.asarray(self.prob)[columns]
+        return np.where(keep, columns, np.asarray(self.alias)[columns])
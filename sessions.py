@@ -0,0 +1,177 @@
+import asyncio
+import sys
+import time
+
+BATTLES_PER_USER = 2  # Concurrent battles one player may have open
+BATTLE_LIMIT = 5000  # Concurrent battles across the whole bot
+BATTLE_TIMEOUT = 120  # Seconds without a move before a battle is abandoned
+SWEEP_TICK = 1.0  # Seconds per timer wheel slot
+WHEEL_SLOTS = 256  # Slots per wheel turn; deadlines further out wrap and are re-checked
+
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) scheduling, and each tick only visits one slot.
+
+    Items are bucketed by the tick their deadline falls in, modulo the
+    number of slots. ``advance`` hands back every item in the slots passed
+    since the last call. A deadline more than one turn away comes up early
+    and must be rescheduled by the caller, as must one pushed back since it
+    was scheduled; that keeps each item in exactly one slot at a time.
+    """
+    def __init__(self, slots=WHEEL_SLOTS, tick=SWEEP_TICK):
+        self.slots = [[] for _ in range(slots)]
+        self.tick = tick
+        self.origin = time.monotonic()
+        self.current = 0
+
+    def schedule(self, item, deadline):
+        ticks = max(self.current + 1, int((deadline - self.origin) / self.tick) + 1)
+        self.slots[ticks % len(self.slots)].append(item)
+
+    def advance(self, now):
+        due = []
+        target = int((now - self.origin) / self.tick)
+        while self.current < target:
+            self.current += 1
+            slot = self.slots[self.current % len(self.slots)]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+        return due
+
+
+class BattleSession:
+    __slots__ = ('session_id', 'user_id', 'view', 'deadline')
+
+    def __init__(self, session_id, user_id, view, deadline):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.view = view
+        self.deadline = deadline
+
+
+class BattleRegistry:
+    """Every live battle, capped per user and globally, with idle battles swept.
+
+    A view joins with ``open`` and leaves with ``finish`` when its battle ends.
+    Each move calls ``touch`` to push its deadline back. A sweeper task
+    advances a TimerWheel once per SWEEP_TICK; sessions idle past
+    BATTLE_TIMEOUT have their view's ``expire()`` awaited and are dropped,
+    so an abandoned battle's state is freed within a tick of timing out.
+    """
+    def __init__(self, per_user=BATTLES_PER_USER, limit=BATTLE_LIMIT, timeout=BATTLE_TIMEOUT,
+                 tick=SWEEP_TICK, slots=WHEEL_SLOTS):
+        self.per_user = per_user
+        self.limit = limit
+        self.timeout = timeout
+        self.wheel = TimerWheel(slots, tick)
+        self.sessions = {}  # session_id -> BattleSession
+        self.by_user = {}  # user_id -> number of open sessions
+        self._next_id = 0
+        self._task = None
+        self.opened = 0
+        self.finished = 0
+        self.expired = 0
+        self.refused = 0
+        self.peak = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close_all(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for session in list(self.sessions.values()):
+            session.view.stop()
+            self.close(session)
+            session.view = None
+
+    def user_count(self, user_id):
+        return self.by_user.get(user_id, 0)
+
+    def full(self):
+        return len(self.sessions) >= self.limit
+
+    def open(self, user_id, view):
+        """Register a battle view, or return None if the user or the bot is at its cap"""
+        if self.user_count(user_id) >= self.per_user or self.full():
+            self.refused += 1
+            return None
+        self._next_id += 1
+        session = BattleSession(self._next_id, user_id, view, time.monotonic() + self.timeout)
+        self.sessions[session.session_id] = session
+        self.by_user[user_id] = self.user_count(user_id) + 1
+        self.wheel.schedule(session, session.deadline)
+        self.opened += 1
+        self.peak = max(self.peak, len(self.sessions))
+        return session
+
+    def touch(self, session):
+        # The wheel entry is left alone; the sweeper reschedules it when it comes up early
+        session.deadline = time.monotonic() + self.timeout
+
+    def close(self, session):
+        """Forget a session; its wheel entry is skipped when swept. Safe to call twice."""
+        if self.sessions.pop(session.session_id, None) is None:
+            return False
+        remaining = self.by_user[session.user_id] - 1
+        if remaining:
+            self.by_user[session.user_id] = remaining
+        else:
+            del self.by_user[session.user_id]
+        return True
+
+    def finish(self, session):
+        """Close a session whose battle ended normally"""
+        if self.close(session):
+            self.finished += 1
+        session.view = None  # The wheel still holds the session until its slot comes round
+
+    async def sweep(self, now=None):
+        """Expire sessions whose deadline has passed, returning how many were expired"""
+        now = time.monotonic() if now is None else now
+        expired = 0
+        for session in self.wheel.advance(now):
+            if session.session_id not in self.sessions:
+                continue
+            if session.deadline > now:
+                self.wheel.schedule(session, session.deadline)
+                continue
+            self.close(session)
+            expired += 1
+            try:
+                await session.view.expire()
+            except Exception as e:
+                print(f"Failed to expire battle {session.session_id}: {e}")
+            session.view = None
+        self.expired += expired
+        return expired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            await self.sweep()
+
+    def memory(self):
+        """Approximate bytes held by live sessions and the wheel"""
+        total = sys.getsizeof(self.sessions) + sys.getsizeof(self.by_user)
+        total += sum(sys.getsizeof(slot) for slot in self.wheel.slots)
+        for session in self.sessions.values():
+            total += sys.getsizeof(session) + session.view.footprint()
+        return total
+
+    def stats(self):
+        return {
+            'live': len(self.sessions),
+            'users': len(self.by_user),
+            'peak': self.peak,
+            'opened': self.opened,
+            'finished': self.finished,
+            'expired': self.expired,
+            'refused': self.refused,
+            'memory': self.memory(),
+        }
@@ -0,0 +1,281 @@
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+import battle
+
+SIMULATION_BATTLES = 10000  # Battles per matrix cell
+SIMULATION_CHUNK = 1 << 20  # Battles simulated together; bounds memory at a few hundred MB
+SIMULATION_MAX_TURNS = 200  # Battles still running after this many rounds count as draws
+CHECK_BATTLES = 2000  # Scalar reference battles per cell for --check
+CHECK_TOLERANCE = 4.0  # Standard errors allowed between vectorized and scalar win rates
+
+AXES = ('element', 'rarity', 'level')
+EFFECTIVENESS = np.array(battle.EFFECTIVENESS)
+RARITY_MULTIPLIERS = np.array([battle.RARITY_MULTIPLIERS[rarity] for rarity in battle.RARITIES])
+
+
+# Vectorized counterparts of the battle.py rules; check() holds them to the scalar engine
+def attack_damage(power, attacker, defender, u):
+    return (power * EFFECTIVENESS[attacker, defender] * (0.8 + (1.2 - 0.8) * u)).astype(np.int64)
+
+
+def special_damage(magic, u):
+    return (magic * (1.2 + (1.5 - 1.2) * u)).astype(np.int64)
+
+
+def ai_choice(power, target_hp, cooldown, u_finish, u_special):
+    finish = (target_hp <= power * battle.AI_FINISH_RANGE) & (u_finish < battle.AI_FINISH_CHANCE)
+    special = ~finish & (cooldown == 0) & (u_special < battle.AI_SPECIAL_CHANCE)
+    return np.where(finish, battle.ATTACK, np.where(special, battle.SPECIAL, battle.DEFEND))
+
+
+def roll_stats(rng, rarity, level):
+    """(power, health, magic) arrays for summoned beasts of the given rarity indexes, trained to level"""
+    gained = level - 1
+    most = int(gained.max(initial=0))
+    mask = np.arange(most) < gained[:, None]
+    multiplier = RARITY_MULTIPLIERS[rarity]
+    stats = []
+    for (low, high), (gain_low, gain_high) in zip(battle.SUMMON_STATS, battle.LEVEL_GAINS):
+        base = (rng.integers(low, high + 1, len(rarity)) * multiplier).astype(np.int64)
+        stats.append(base + (rng.integers(gain_low, gain_high + 1, (len(rarity), most)) * mask).sum(axis=1))
+    return stats
+
+
+def simulate(side_a, side_b, rng, max_turns=SIMULATION_MAX_TURNS):
+    """Play one AI-vs-AI battle per lane, returning (outcome, turns) arrays.
+
+    Each side is a tuple of (element, power, health, magic) arrays. side_a
+    sits in the player's seat of battle.step, so its defends halve the next
+    hit, and side_b replies. Outcome is battle.VICTORY when side_a wins,
+    battle.DEFEAT when side_b wins and 0 for a draw at max_turns. Finished
+    lanes are dropped each round, so long battles do not slow the rest.
+    """
+    element_a, power_a, health_a, magic_a = side_a
+    element_b, power_b, health_b, magic_b = side_b
+    hp_a = health_a.astype(np.int64)
+    hp_b = health_b.astype(np.int64)
+    cooldown_a = np.zeros(len(hp_a), np.int64)
+    cooldown_b = np.zeros(len(hp_a), np.int64)
+    outcome = np.zeros(len(hp_a), np.int8)
+    turns = np.zeros(len(hp_a), np.int64)
+    live = np.arange(len(hp_a))
+    for turn in range(1, max_turns + 1):
+        if not live.size:
+            break
+        u = rng.random((6, live.size))
+        ea, eb = element_a[live], element_b[live]
+        pa, pb = power_a[live], power_b[live]
+        ha, hb = hp_a[live], hp_b[live]
+        ca, cb = cooldown_a[live], cooldown_b[live]
+
+        # Player seat
+        action = ai_choice(pa, hb, ca, u[0], u[1])
+        damage = np.where(action == battle.ATTACK, attack_damage(pa, ea, eb, u[2]),
+                          np.where(action == battle.SPECIAL, special_damage(magic_a[live], u[2]), 0))
+        hb = hb - damage
+        won = hb <= 0
+
+        # Opponent seat, skipped where the player already won
+        reply = ai_choice(pb, ha, cb, u[3], u[4])
+        damage = np.where(reply == battle.ATTACK, attack_damage(pb, eb, ea, u[5]),
+                          np.where(reply == battle.SPECIAL, special_damage(magic_b[live], u[5]), 0))
+        damage = np.where(action == battle.DEFEND, damage // 2, damage)
+        ha = ha - np.where(won, 0, damage)
+        lost = ~won & (ha <= 0)
+
+        hp_a[live], hp_b[live] = ha, hb
+        cooldown_a[live] = np.where(action == battle.SPECIAL, battle.SPECIAL_COOLDOWN, np.maximum(ca - 1, 0))
+        cooldown_b[live] = np.where(reply == battle.SPECIAL, battle.SPECIAL_COOLDOWN, np.maximum(cb - 1, 0))
+        turns[live] = turn
+        outcome[live[won]] = battle.VICTORY
+        outcome[live[lost]] = battle.DEFEAT
+        live = live[~(won | lost)]
+    return outcome, turns
+
+
+def _labels(axis, levels):
+    if axis == 'element':
+        return list(battle.ELEMENTS)
+    if axis == 'rarity':
+        return list(battle.RARITIES)
+    return [f'Lv{level}' for level in range(1, levels + 1)]
+
+
+def _side(axis, index, rng, rarity, level):
+    """(element, rarity index, level) arrays for one side, varying axis by index"""
+    element = index if axis == 'element' else rng.integers(0, len(battle.ELEMENTS), len(index))
+    rarities = index if axis == 'rarity' else np.full(len(index), battle.RARITIES.index(rarity))
+    levels = index + 1 if axis == 'level' else np.full(len(index), level)
+    return element, rarities, levels
+
+
+def matrix(axis='element', battles=SIMULATION_BATTLES, rarity='Common', level=1, levels=10, seed=None):
+    """Win rate of every row value against every column value along one axis.
+
+    axis is 'element', 'rarity' or 'level'; the other two are held at rarity
+    and level (elements not on the axis are drawn at random). Beasts get
+    fresh summon stats, plus level-up gains, for every battle.
+    """
+    labels = _labels(axis, levels)
+    size = len(labels)
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(size * size, np.int64)
+    draws = np.zeros(size * size, np.int64)
+    turn_totals = np.zeros(size * size, np.int64)
+    start = time.perf_counter()
+    total = size * size * battles
+    for first in range(0, total, SIMULATION_CHUNK):
+        cells = np.arange(first, min(total, first + SIMULATION_CHUNK)) // battles
+        row, column = np.divmod(cells, size)
+        sides = []
+        for index in (row, column):
+            element, rarities, side_levels = _side(axis, index, rng, rarity, level)
+            sides.append((element, *roll_stats(rng, rarities, side_levels)))
+        outcome, turns = simulate(*sides, rng)
+        wins += np.bincount(cells, outcome == battle.VICTORY, size * size).astype(np.int64)
+        draws += np.bincount(cells, outcome == 0, size * size).astype(np.int64)
+        turn_totals += np.bincount(cells, turns, size * size).astype(np.int64)
+    elapsed = time.perf_counter() - start
+    return {
+        'axis': axis,
+        'labels': labels,
+        'battles': battles,
+        'win_rate': (wins / battles).reshape(size, size),
+        'draw_rate': (draws / battles).reshape(size, size),
+        'turns': (turn_totals / battles).reshape(size, size),
+        'seconds': elapsed,
+        'battles_per_second': total / elapsed if elapsed else 0.0,
+    }
+
+
+def _roll_beast(rng, element, rarity, level):
+    multiplier = battle.RARITY_MULTIPLIERS[battle.RARITIES[rarity]]
+    stats = []
+    for (low, high), (gain_low, gain_high) in zip(battle.SUMMON_STATS, battle.LEVEL_GAINS):
+        stats.append(int(rng.randint(low, high) * multiplier) +
+                     sum(rng.randint(gain_low, gain_high) for _ in range(level - 1)))
+    power, health, magic = stats
+    return battle.Beast(None, '', element, level, power, health, magic, battle.RARITIES[rarity])
+
+
+def scalar_matrix(axis='element', battles=CHECK_BATTLES, rarity='Common', level=1, levels=10, seed=None,
+                  max_turns=SIMULATION_MAX_TURNS):
+    """Reference for matrix(): the same battles played one at a time through battle.step"""
+    labels = _labels(axis, levels)
+    size = len(labels)
+    rng = random.Random(seed)
+    wins = np.zeros((size, size))
+    draws = np.zeros((size, size))
+    turn_totals = np.zeros((size, size))
+    for row in range(size):
+        for column in range(size):
+            for _ in range(battles):
+                beasts = []
+                for index in (row, column):
+                    element = index if axis == 'element' else rng.randrange(len(battle.ELEMENTS))
+                    rarity_index = index if axis == 'rarity' else battle.RARITIES.index(rarity)
+                    beasts.append(_roll_beast(rng, element, rarity_index, index + 1 if axis == 'level' else level))
+                state = battle.BattleState(*beasts)
+                battle.play_ai(state, rng, max_turns)
+                wins[row, column] += state.outcome == battle.VICTORY
+                draws[row, column] += state.outcome is None
+                turn_totals[row, column] += state.turn
+    return {
+        'axis': axis,
+        'labels': labels,
+        'battles': battles,
+        'win_rate': wins / battles,
+        'draw_rate': draws / battles,
+        'turns': turn_totals / battles,
+    }
+
+
+class _Replay:
+    """Stands in for random.Random, answering uniform() from a fixed draw"""
+    def __init__(self, u):
+        self.u = u
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.u
+
+
+def check(axis='element', battles=CHECK_BATTLES, rarity='Common', level=1, levels=10, seed=None):
+    """Compare the vectorized simulator to the scalar engine, returning a list of mismatches.
+
+    Damage formulas must agree exactly on shared random draws. Win rates
+    and mean turns, which come from different random streams, must agree
+    within CHECK_TOLERANCE standard errors in every cell.
+    """
+    problems = []
+    rng = np.random.default_rng(seed)
+    u = rng.random(2000)
+    stat = rng.integers(1, 500, 2000)
+    attacker = rng.integers(0, len(battle.ELEMENTS), 2000)
+    defender = rng.integers(0, len(battle.ELEMENTS), 2000)
+    vector_attack = attack_damage(stat, attacker, defender, u)
+    vector_special = special_damage(stat, u)
+    for i in range(len(u)):
+        beast = battle.Beast(None, '', int(attacker[i]), 1, int(stat[i]), 1, int(stat[i]), '')
+        target = battle.Beast(None, '', int(defender[i]), 1, 1, 1, 1, '')
+        if battle._attack_damage(beast, target, _Replay(u[i])) != vector_attack[i]:
+            problems.append(f'attack damage differs for power {stat[i]}, u {u[i]!r}')
+        if battle._special_damage(beast, _Replay(u[i])) != vector_special[i]:
+            problems.append(f'special damage differs for magic {stat[i]}, u {u[i]!r}')
+
+    vector = matrix(axis, battles, rarity, level, levels, seed)
+    scalar = scalar_matrix(axis, battles, rarity, level, levels, seed)
+    p = (vector['win_rate'] + scalar['win_rate']) / 2
+    error = np.sqrt(np.maximum(p * (1 - p), 1 / battles) * 2 / battles)
+    z = np.abs(vector['win_rate'] - scalar['win_rate']) / error
+    labels = vector['labels']
+    for row, column in zip(*np.nonzero(z > CHECK_TOLERANCE)):
+        problems.append(f'{labels[row]} vs {labels[column]}: win rate {vector["win_rate"][row, column]:.3f} '
+                        f'vectorized, {scalar["win_rate"][row, column]:.3f} scalar')
+    turn_error = np.abs(vector['turns'] - scalar['turns']) / np.maximum(scalar['turns'], 1)
+    for row, column in zip(*np.nonzero(turn_error > 0.1)):
+        problems.append(f'{labels[row]} vs {labels[column]}: {vector["turns"][row, column]:.2f} turns '
+                        f'vectorized, {scalar["turns"][row, column]:.2f} scalar')
+    return problems
+
+
+def format_matrix(result, key='win_rate'):
+    """Plain-text table of one result matrix; rows attack from the player's seat"""
+    labels = result['labels']
+    width = max(len(label) for label in labels) + 1
+    lines = [' ' * width + ''.join(f'{label[:5]:>6}' for label in labels)]
+    for label, row in zip(labels, result[key]):
+        if key == 'turns':
+            cells = ''.join(f'{value:6.1f}' for value in row)
+        else:
+            cells = ''.join(f'{value:6.0%}' for value in row)
+        lines.append(f'{label:<{width}}{cells}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo AI-vs-AI battle balance')
+    parser.add_argument('axis', nargs='?', choices=AXES, default='element')
+    parser.add_argument('--battles', type=int, default=SIMULATION_BATTLES, help='battles per cell')
+    parser.add_argument('--rarity', choices=battle.RARITIES, default='Common')
+    parser.add_argument('--level', type=int, default=1)
+    parser.add_argument('--levels', type=int, default=10, help='levels compared on the level axis')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--check', action='store_true', help='compare against the scalar battle engine')
+    args = parser.parse_args()
+    if args.check:
+        problems = check(args.axis, min(args.battles, CHECK_BATTLES), args.rarity, args.level, args.levels, args.seed)
+        for problem in problems:
+            print(problem)
+        print('Vectorized simulator matches the battle engine' if not problems else f'{len(problems)} mismatches')
+        sys.exit(1 if problems else 0)
+    result = matrix(args.axis, args.battles, args.rarity, args.level, args.levels, args.seed)
+    print(f'Win rate, row (player seat) against column:\n{format_matrix(result)}\n')
+    print(f'Draw rate:\n{format_matrix(result, "draw_rate")}\n')
+    print(f'Mean turns:\n{format_matrix(result, "turns")}\n')
+    total = len(result['labels']) ** 2 * result['battles']
+    print(f'{total:,} battles in {result["seconds"]:.1f}s ({result["battles_per_second"]:,.0f}/s)')
@@ -0,0 +1,307 @@
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict
+
+WALLET_FLUSH_INTERVAL = 0.005  # Seconds between wallet group commits
+WALLET_RETRY_MAX = 5.0  # Longest wait between retries while group commits keep failing
+WALLET_RETRY_LOG = 30.0  # Seconds between log lines about the same run of failures
+WALLET_DURABLE = True  # Wait for the group commit before a balance change returns
+
+
+def _check_finite(*amounts):
+    # NaN slips past every balance comparison and SQLite stores it as NULL, wiping the balance
+    for amount in amounts:
+        if not math.isfinite(amount):
+            raise ValueError(f'eldergem amounts must be finite, got {amount}')
+
+
+class Wallet:
+    """Write-behind buffer for eldergem balance changes.
+
+    Balance deltas are coalesced per user in memory and written in one
+    transaction every few milliseconds, so a burst of bets costs a single
+    commit. With ``durable`` set, ``adjust`` waits for the group commit that
+    contains its delta; otherwise it returns at once and a crash can lose up
+    to one flush interval of changes.
+
+    ``debit`` and ``play_rounds`` are the only ways to spend eldergems. Each
+    debit is a single conditional UPDATE ... RETURNING inside the next group
+    commit, so the balance check and the deduction can never be split by
+    another command. ``play_rounds`` settles a run of bets the same way,
+    checking the stake against the balance before every round.
+
+    Every group commit bumps ``wallet_flushes.seq`` in the same transaction.
+    ``fetch_player`` reads that sequence alongside the player row, so it can
+    add exactly the deltas the row does not include yet. Players in the
+    cache are kept current as of the last commit: each commit adds its
+    deltas to the cached rows it touches, and to the eldergems leaderboard.
+    """
+    def __init__(self, db, cache, leaderboard=None, flush_interval=WALLET_FLUSH_INTERVAL, durable=WALLET_DURABLE):
+        self.db = db
+        self.cache = cache
+        self.leaderboard = leaderboard
+        self.flush_interval = flush_interval
+        self.durable = durable
+        self.pending = defaultdict(float)
+        self.in_flight = {}  # flush seq -> deltas committed (or being committed) by that flush
+        self.committed = 0
+        self.flushes = 0
+        self._seq = 0
+        self._waiters = []
+        self._debits = []  # (user_id, amount, future) waiting for the next group commit
+        self._rounds = []  # (user_id, stake, deltas, future) waiting for the next group commit
+        self._reads = Counter()  # committed seq at start -> active reads
+        self._dirty = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    async def start(self):
+        self._seq = self.committed = await self.db.fetchval('SELECT seq FROM wallet_flushes')
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Take the lock so the loop is never cancelled halfway through a commit
+        async with self._flush_lock:
+            if self._task:
+                self._task.cancel()
+                self._task = None
+        await self.flush()
+
+    async def _run(self):
+        delay = self.flush_interval
+        failures = 0
+        logged = 0.0
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(delay)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Deltas stay queued; back off so a locked or full database isn't retried 200 times a second
+                failures += 1
+                delay = min(delay * 2, WALLET_RETRY_MAX)
+                now = time.monotonic()
+                if failures == 1 or now - logged >= WALLET_RETRY_LOG:
+                    logged = now
+                    print(f'Wallet flush failed ({failures} in a row, retrying in {delay:.2f}s): {e}')
+                continue
+            if failures:
+                print(f'Wallet flush recovered after {failures} failed attempts')
+            failures = 0
+            delay = self.flush_interval
+
+    async def adjust(self, user_id, amount):
+        """Add amount (negative to debit) to a player's eldergems"""
+        _check_finite(amount)
+        self.pending[user_id] += amount
+        self._dirty.set()
+        if self.durable:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    async def debit(self, user_id, amount):
+        """Deduct amount if the balance covers it, returning the new balance or None"""
+        _check_finite(amount)
+        future = asyncio.get_running_loop().create_future()
+        self._debits.append((user_id, amount, future))
+        self._dirty.set()
+        return await future
+
+    async def play_rounds(self, user_id, stake, deltas):
+        """Settle consecutive bets of stake with net results deltas in one update.
+
+        Rounds are played in order while the balance covers the stake.
+        Returns (rounds played, new balance), or None if the player has no row.
+        """
+        _check_finite(stake, *deltas)
+        future = asyncio.get_running_loop().create_future()
+        self._rounds.append((user_id, stake, deltas, future))
+        self._dirty.set()
+        return await future
+
+    @staticmethod
+    def _apply(cursor, seq, credits, debits, rounds, applied):
+        cursor.executemany('UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?',
+                           [(delta, user_id) for user_id, delta in credits.items()])
+        balances = []
+        for user_id, amount, _ in debits:
+            row = cursor.execute('''
+                UPDATE players SET eldergems = eldergems - ?
+                WHERE user_id = ? AND eldergems >= ?
+                RETURNING eldergems
+            ''', (amount, user_id, amount)).fetchone()
+            if row is not None:
+                # Record before the commit so readers that see this seq see the debit too
+                applied[user_id] -= amount
+            balances.append(row[0] if row is not None else None)
+        for user_id, stake, deltas, _ in rounds:
+            row = cursor.execute('SELECT eldergems FROM players WHERE user_id = ?', (user_id,)).fetchone()
+            if row is None:
+                balances.append(None)
+                continue
+            played, net = 0, 0.0
+            for delta in deltas:
+                if row[0] + net < stake:
+                    break
+                net += delta
+                played += 1
+            cursor.execute('UPDATE players SET eldergems = eldergems + ? WHERE user_id = ?', (net, user_id))
+            applied[user_id] += net
+            balances.append((played, row[0] + net))
+        cursor.execute('UPDATE wallet_flushes SET seq = ?', (seq,))
+        return balances
+
+    async def flush(self):
+        async with self._flush_lock:
+            self._dirty.clear()
+            if not self.pending and not self._debits and not self._rounds:
+                return
+            credits, self.pending = self.pending, defaultdict(float)
+            debits, self._debits = self._debits, []
+            rounds, self._rounds = self._rounds, []
+            waiters, self._waiters = self._waiters, []
+            self._seq += 1
+            seq = self._seq
+            applied = self.in_flight[seq] = defaultdict(float, credits)
+            for user_id, *_ in debits + rounds:
+                # The writer thread only updates values, so readers can iterate safely
+                applied[user_id] += 0.0
+            try:
+                balances = await self.db.transaction(self._apply, seq, credits, debits, rounds, applied)
+            except Exception:
+                # Requeue so nothing is lost; waiters ride along with the retry
+                del self.in_flight[seq]
+                self._seq -= 1
+                for user_id, delta in credits.items():
+                    self.pending[user_id] += delta
+                self._debits[:0] = debits
+                self._rounds[:0] = rounds
+                self._waiters.extend(waiters)
+                self._dirty.set()
+                raise
+            self.committed = seq
+            self.flushes += 1
+            try:
+                for user_id, delta in applied.items():
+                    try:
+                        player = self.cache.peek(user_id)
+                        if player is not None:
+                            player['eldergems'] += delta
+                        if self.leaderboard is not None and delta:
+                            self.leaderboard.adjust(user_id, delta)
+                    except Exception as e:
+                        # The commit stands; a stale cache entry or rank must not strand the waiters
+                        print(f'Wallet bookkeeping failed for {user_id}: {e}')
+                        self.cache.invalidate(user_id)
+            finally:
+                futures = [entry[-1] for entry in debits + rounds]
+                for future, balance in zip(futures, balances):
+                    if not future.done():
+                        future.set_result(balance)
+                self._prune()
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    def _prune(self):
+        # A read that started after seq committed already sees it in its row
+        oldest = min(self._reads) if self._reads else self.committed
+        for seq in [seq for seq in self.in_flight if seq <= oldest]:
+            del self.in_flight[seq]
+
+    def _catch_up(self, user_id, seen_seq):
+        """Adjustment that makes a row read at seen_seq current as of self.committed"""
+        delta = 0.0
+        for seq, deltas in self.in_flight.items():
+            if seen_seq < seq <= self.committed:
+                delta += deltas.get(user_id, 0.0)
+            elif self.committed < seq <= seen_seq:
+                # Committed in the database but not acknowledged on the event loop yet
+                delta -= deltas.get(user_id, 0.0)
+        return delta
+
+    def pending_delta(self, user_id):
+        """Deltas for user_id that are not committed yet"""
+        delta = self.pending.get(user_id, 0.0)
+        for seq, deltas in self.in_flight.items():
+            if seq > self.committed:
+                delta += deltas.get(user_id, 0.0)
+        return delta
+
+    async def _load_player(self, user_id):
+        start = self.committed
+        epoch = self.cache.epoch
+        self._reads[start] += 1
+        try:
+            row = await self.db.fetchone('''
+                SELECT players.*, wallet_flushes.seq AS wallet_seq
+                FROM players, wallet_flushes
+                WHERE players.user_id = ?
+            ''', (user_id,))
+            if row is None:
+                return None
+            # Bring the row up to date with commits it missed while the read was running
+            player = dict(row)
+            player['eldergems'] += self._catch_up(user_id, player.pop('wallet_seq'))
+            self.cache.put(user_id, player, epoch)
+            return player
+        finally:
+            self._reads[start] -= 1
+            if not self._reads[start]:
+                del self._reads[start]
+
+    async def fetch_player(self, user_id):
+        """Read a player row (cached when possible) with buffered balance changes applied"""
+        player = self.cache.get(user_id)
+        if player is None:
+            player = await self._load_player(user_id)
+            if player is None:
+                return None
+        player = dict(player)
+        player['eldergems'] += self.pending_delta(user_id)
+        return player
+
+    async def balance(self, user_id):
+        player = await self.fetch_player(user_id)
+        return player['eldergems'] if player else None
+
+
+class ShardedWallet:
+    """One Wallet per database shard, routed by user_id.
+
+    Each shard group-commits its own deltas; the player cache is shared.
+    """
+    def __init__(self, db, cache, leaderboard=None, flush_interval=WALLET_FLUSH_INTERVAL, durable=WALLET_DURABLE):
+        self.db = db
+        self.wallets = {id(shard): Wallet(shard, cache, leaderboard, flush_interval, durable) for shard in db.shards}
+
+    def wallet(self, user_id):
+        return self.wallets[id(self.db.shard(user_id))]
+
+    @property
+    def flushes(self):
+        return sum(wallet.flushes for wallet in self.wallets.values())
+
+    async def start(self):
+        for wallet in self.wallets.values():
+            await wallet.start()
+
+    async def close(self):
+        await asyncio.gather(*(wallet.close() for wallet in self.wallets.values()))
+
+    async def adjust(self, user_id, amount):
+        await self.wallet(user_id).adjust(user_id, amount)
+
+    async def debit(self, user_id, amount):
+        return await self.wallet(user_id).debit(user_id, amount)
+
+    async def play_rounds(self, user_id, stake, deltas):
+        return await self.wallet(user_id).play_rounds(user_id, stake, deltas)
+
+    async def fetch_player(self, user_id):
+        return await self.wallet(user_id).fetch_player(user_id)
+
+    async def balance(self, user_id):
+        return await self.wallet(user_id).balance(user_id)